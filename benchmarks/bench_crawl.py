@@ -0,0 +1,239 @@
+''' Throughput of the crawler and of its stages on a recorded corpus.
+
+Usage: python -m benchmarks.bench_crawl <record dir> [--scenario all]
+           [--mode thread] [--threads 1] [--latency 0] [--error_rate 0]
+           [--startup_urls 100000] [--output results.json]
+           [--baseline results.json]
+
+Record a corpus first by crawling with RECORDDIR set in config.ini. The
+"stages" scenario times is_valid, extract_next_links, html2text and
+Frontier.add_url on every recorded page, the "crawl" scenario runs the whole
+crawler against a stand-in cache server replaying the corpus and the
+"startup" scenario times importing the crawler and resuming from a save file
+of --startup_urls urls until the first url is served. Results are
+printed with their change from --baseline, and saved with --output.
+'''
+import os
+import sys
+import subprocess
+import json
+import time
+import logging
+import resource
+import tempfile
+from argparse import ArgumentParser
+from configparser import ConfigParser
+from urllib.parse import urlparse
+
+import cbor
+
+import scraper
+from utils.config import Config
+from utils.response import Response, RawResponse
+from utils.recorder import iter_records
+from utils.metrics import DOWNLOAD_SECONDS, PAGES
+from benchmarks.cache_server import CacheServer
+
+
+def load_config(config_file, directory):
+    # config.ini with the save file and reports moved to a scratch directory.
+    cparser = ConfigParser()
+    cparser.read(config_file)
+    config = Config(cparser)
+    config.save_file = os.path.join(directory, "frontier.shelve")
+    config.log_dir = os.path.join(directory, "Logs")
+    config.record_dir = ""
+    return config
+
+
+def load_pages(record_dir):
+    pages = []
+    for record in iter_records(record_dir):
+        raw = RawResponse(
+            record["status"], {"content-type": record["content_type"] or ""}, record["body"])
+        try:
+            resp = Response(cbor.loads(record["body"]), raw=raw)
+        except (EOFError, ValueError):
+            continue
+        if resp.status == 200 and resp.raw_response is not None:
+            pages.append((record["url"], resp))
+    return pages
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux; children are the parser processes.
+    rss = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+           + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return round(rss / 1024, 1)
+
+
+def summarize(name, latencies, elapsed, unit="pages"):
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        "name": name, "count": count, f"{unit}_per_second": round(count / elapsed, 1),
+        "p50_ms": round(latencies[count // 2] * 1000, 3) if count else 0.0,
+        "p99_ms": round(latencies[min(count - 1, int(count * 0.99))] * 1000, 3) if count else 0.0,
+        "peak_rss_mb": peak_rss_mb()}
+
+
+def time_calls(name, function, args, unit="pages"):
+    latencies = []
+    start = time.perf_counter()
+    for arg in args:
+        call_start = time.perf_counter()
+        function(*arg)
+        latencies.append(time.perf_counter() - call_start)
+    return summarize(name, latencies, time.perf_counter() - start, unit)
+
+
+def bench_stages(args, directory):
+    from crawler.frontier import Frontier
+
+    pages = load_pages(args.record_dir)
+    if not pages:
+        sys.exit(f"No recorded pages in {args.record_dir}")
+    logger = logging.getLogger("bench")
+    links = [link for url, resp in pages for link in scraper.extract_next_links(url, resp, logger)]
+
+    config = load_config(args.config_file, directory)
+    config.duplicate_distance = -1
+    config.page_cache = False
+    config.robots = False
+    frontier = Frontier(config, True)
+    results = [
+        time_calls("is_valid", scraper.is_valid, [(link,) for link in links], "urls"),
+        time_calls("extract_next_links", scraper.extract_next_links,
+                   [(url, resp, logger) for url, resp in pages]),
+        time_calls("html2text", scraper.html2text, [(resp,) for _, resp in pages]),
+        time_calls("Frontier.add_url", frontier.add_url, [(link,) for link in links], "urls"),
+    ]
+    frontier.close()
+    return results
+
+
+def bench_crawl(args, directory):
+    from launch import CRAWLER_MODES
+
+    server = CacheServer(
+        args.record_dir, latency=args.latency, jitter=args.jitter,
+        error_rate=args.error_rate).start()
+    config = load_config(args.config_file, directory)
+    config.cache_server = server.address
+    config.time_delay = args.politeness
+    config.threads_count = args.threads
+    crawler = CRAWLER_MODES[args.mode](config, True)
+    start = time.perf_counter()
+    crawler.start()
+    elapsed = time.perf_counter() - start
+    server.stop()
+
+    pages = PAGES.value
+    return [{
+        "name": f"crawl ({args.mode}, {args.threads} threads)", "count": pages,
+        "pages_per_second": round(pages / elapsed, 1),
+        "p50_ms": round(DOWNLOAD_SECONDS.quantile(0.5) * 1000, 3),
+        "p99_ms": round(DOWNLOAD_SECONDS.quantile(0.99) * 1000, 3),
+        "peak_rss_mb": peak_rss_mb(),
+        "requests": server.requests}]
+
+
+def bench_startup(args, directory):
+    from crawler.frontier import Frontier
+
+    # A fresh interpreter, so nothing is imported yet.
+    elapsed = float(subprocess.run(
+        [sys.executable, "-c",
+         "import time; start = time.perf_counter(); import launch; "
+         "print(time.perf_counter() - start)"],
+        check=True, capture_output=True, text=True).stdout.split()[-1])
+    results = [{"name": "startup: import launch", "seconds": round(elapsed, 3)}]
+
+    config = load_config(args.config_file, directory)
+    config.robots = False
+    config.duplicate_distance = -1
+    config.trap_template_budget = args.startup_urls
+    frontier = Frontier(config, True)
+    frontier.add_urls(
+        [f"https://www.ics.uci.edu/bench/{i}" for i in range(args.startup_urls)], 1)
+    frontier.close()
+
+    for fast_start in (False, True):
+        config.fast_start = fast_start
+        start = time.perf_counter()
+        frontier = Frontier(config, False)
+        url = frontier.get_tbd_url()
+        elapsed = time.perf_counter() - start
+        frontier.to_be_downloaded.release(urlparse(url).netloc)
+        while frontier.loading:
+            time.sleep(0.01)
+        frontier.close()
+        mode = "fast start" if fast_start else "full load"
+        results.append({
+            "name": f"startup: resume to first url ({mode})",
+            "seconds": round(elapsed, 3), "peak_rss_mb": peak_rss_mb()})
+    return results
+
+
+SCENARIOS = {
+    "stages": bench_stages,
+    "crawl": bench_crawl,
+    "startup": bench_startup,
+}
+
+
+def report(results, baseline):
+    previous = {result["name"]: result for result in baseline}
+    for result in results:
+        if "seconds" in result:
+            line = f"{result['name']:>34}: {result['seconds']:>10} seconds"
+            before = previous.get(result["name"], {}).get("seconds")
+            if before:
+                line += f" ({result['seconds'] / before - 1:+.1%} vs baseline)"
+            print(line)
+            continue
+        rate = next(key for key in result if key.endswith("_per_second"))
+        line = (f"{result['name']:>34}: {result[rate]:>10} {rate.replace('_', ' ')}, "
+                f"p50 {result['p50_ms']}ms, p99 {result['p99_ms']}ms, "
+                f"peak RSS {result['peak_rss_mb']}MB")
+        if result["name"] in previous and previous[result["name"]][rate]:
+            change = result[rate] / previous[result["name"]][rate] - 1
+            line += f" ({change:+.1%} vs baseline)"
+        print(line)
+
+
+def main():
+    parser = ArgumentParser(usage=__doc__)
+    parser.add_argument("record_dir")
+    parser.add_argument("--scenario", choices=list(SCENARIOS) + ["all"], default="all")
+    parser.add_argument("--config_file", default="config.ini")
+    parser.add_argument("--mode", default="thread")
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--politeness", type=float, default=0.0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error_rate", type=float, default=0.0)
+    parser.add_argument("--startup_urls", type=int, default=100000)
+    parser.add_argument("--output")
+    parser.add_argument("--baseline")
+    args = parser.parse_args()
+
+    baseline = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    scenarios = SCENARIOS if args.scenario == "all" else [args.scenario]
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for scenario in scenarios:
+            results.extend(SCENARIOS[scenario](args, os.path.join(directory, scenario)))
+    report(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+''' Compare the tokenizer with the per page enchant.Dict version it replaced.
+
+Usage: python -m benchmarks.bench_tokenizer <directory of saved .html pages>
+'''
+import os
+import sys
+import time
+
+from utils import stop_words
+from utils.parse import parse_html
+from utils.tokenizer import tokenize
+
+
+def legacy_tokenize(text):
+    # scraper.html2text before the tokenizer: one enchant.Dict per page,
+    # split + replace, and stop words in a list.
+    import enchant
+
+    stop_word_list = sorted(stop_words)
+    d = enchant.Dict("en_US")
+    word_list = []
+    for word in text.split():
+        word = word.replace("\x00", "")
+        word = word.lower()
+
+        if word and d.check(word):
+            if word not in stop_word_list:
+                word_list.append(word)
+    return word_list
+
+
+def load_texts(directory):
+    texts = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith((".html", ".htm")):
+            with open(os.path.join(directory, name), "rb") as f:
+                texts.append(parse_html("http://localhost/", f.read())[1])
+    return texts
+
+
+def bench(function, texts):
+    start = time.perf_counter()
+    results = [function(text) for text in texts]
+    return time.perf_counter() - start, results
+
+
+def main(directory):
+    texts = load_texts(directory)
+    if not texts:
+        sys.exit(f"No .html pages in {directory}")
+    words = sum(len(text.split()) for text in texts)
+    print(f"{len(texts)} pages, {words} tokens")
+
+    for name, function in (("legacy", legacy_tokenize), ("tokenizer", tokenize)):
+        elapsed, results = bench(function, texts)
+        print(f"{name:>10}: {elapsed:.3f}s, {len(texts) / elapsed:.1f} pages/s, "
+              f"{words / elapsed:.0f} tokens/s")
+        if name == "legacy":
+            expected = results
+        elif results != expected:
+            print("WARNING: tokenizer output differs from the legacy version")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit(__doc__)
+    main(sys.argv[1])
@@ -0,0 +1,101 @@
+''' Stand-in cache server that replays responses recorded with RECORDDIR.
+
+Usage: python -m benchmarks.cache_server <record dir> [--port 9001]
+           [--latency 0.05] [--jitter 0.02] [--error_rate 0.01]
+
+Urls that were not recorded get a 404 cache response. With --error_rate a
+share of the requests fails with an empty 502, like an overloaded server.
+'''
+import time
+import random
+from argparse import ArgumentParser
+from threading import Thread
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import cbor
+
+from utils.recorder import load_record
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        url = parse_qs(urlparse(self.path).query).get("q", [""])[0]
+        delay = server.latency + random.uniform(0, server.jitter)
+        if delay:
+            time.sleep(delay)
+
+        if server.error_rate and random.random() < server.error_rate:
+            status, content_type, body = 502, "text/plain", b""
+        else:
+            record = load_record(server.record_dir, url)
+            if record is None:
+                status, content_type = 200, "application/cbor"
+                body = cbor.dumps({"url": url, "status": 404, "error": "not recorded"})
+            else:
+                status, content_type, body = (
+                    record["status"], record["content_type"], record["body"])
+        server.requests += 1
+
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class CacheServer(object):
+    ''' Serves the recorded responses in record_dir on host:port, in a
+    background thread, adding latency + up to jitter seconds per request. '''
+    def __init__(self, record_dir, host="127.0.0.1", port=0, latency=0.0,
+                 jitter=0.0, error_rate=0.0):
+        self.server = ThreadingHTTPServer((host, port), _Handler)
+        self.server.daemon_threads = True
+        self.server.record_dir = record_dir
+        self.server.latency = latency
+        self.server.jitter = jitter
+        self.server.error_rate = error_rate
+        self.server.requests = 0
+        self.address = self.server.server_address
+        self.thread = Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def requests(self):
+        return self.server.requests
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = ArgumentParser(usage=__doc__)
+    parser.add_argument("record_dir")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9001)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error_rate", type=float, default=0.0)
+    args = parser.parse_args()
+    server = CacheServer(
+        args.record_dir, args.host, args.port, args.latency, args.jitter, args.error_rate)
+    print(f"Replaying {args.record_dir} on {args.host}:{args.port}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 from utils import get_logger
+from utils.metrics import MetricsReporter
 from crawler.frontier import Frontier
 from crawler.worker import Worker
 
@@ -18,10 +19,16 @@ class Crawler(object):
             worker.start()
 
     def start(self):
+        metrics = MetricsReporter(
+            f"{self.config.log_dir}/metrics.json",
+            self.config.metrics_interval, self.config.metrics_port)
+        metrics.start()
         self.start_async()
         self.join()
+        metrics.stop()
 
         self.frontier.record_info()
+        self.frontier.close()
 
     def join(self):
         for worker in self.workers:
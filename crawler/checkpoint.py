@@ -0,0 +1,114 @@
+import os
+import json
+import struct
+from array import array
+from contextlib import contextmanager
+from threading import Thread, Event, Lock, Condition
+
+MAGIC = b"ANL1"
+_HEADER = struct.Struct("<4sIQQ")
+
+
+class AnalyticsCheckpoint(object):
+    ''' Periodic binary checkpoint of the crawl analytics.
+
+    `collect` returns (meta, terms, counts): a json-able dict of counters, the
+    counted words and an array("Q") of their counts. The file holds a header,
+    the json meta, the words separated by newlines and the raw counts, and is
+    written to a temporary file and renamed, so a crash leaves the previous
+    checkpoint intact. It is written every `interval` seconds (0 disables
+    the thread) and by `save`.
+    '''
+    def __init__(self, path, collect, interval=300.0):
+        self.path = path
+        self.collect = collect
+        self.interval = interval
+        self.lock = Lock()
+        self.stopped = Event()
+        self.thread = None
+
+    def start(self):
+        if self.interval > 0:
+            self.thread = Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.save()
+
+    def save(self):
+        meta, terms, counts = self.collect()
+        meta = json.dumps(meta).encode("utf-8")
+        words = "\n".join(terms).encode("utf-8")
+        with self.lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(_HEADER.pack(MAGIC, len(meta), len(words), len(counts)))
+                f.write(meta)
+                f.write(words)
+                counts.tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+    def load(self):
+        ''' (meta, terms, counts) of the last checkpoint, or None. '''
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "rb") as f:
+            magic, meta_size, words_size, count = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{self.path} is not an analytics checkpoint")
+            meta = json.loads(f.read(meta_size))
+            words = f.read(words_size).decode("utf-8")
+            counts = array("Q")
+            counts.fromfile(f, count)
+        terms = words.split("\n") if count else []
+        return meta, terms, counts
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.save()
+
+
+class CheckpointGate(object):
+    ''' Lets any number of page updates run at once, or one checkpoint.
+
+    A checkpoint waits for the updates in progress and holds back new ones,
+    so the analytics it writes match the pages completed in the save file.
+    '''
+    def __init__(self):
+        self.cond = Condition()
+        self.updates = 0
+        self.checkpointing = False
+
+    @contextmanager
+    def update(self):
+        with self.cond:
+            while self.checkpointing:
+                self.cond.wait()
+            self.updates += 1
+        try:
+            yield
+        finally:
+            with self.cond:
+                self.updates -= 1
+                if not self.updates:
+                    self.cond.notify_all()
+
+    @contextmanager
+    def checkpoint(self):
+        with self.cond:
+            while self.checkpointing:
+                self.cond.wait()
+            self.checkpointing = True
+            while self.updates:
+                self.cond.wait()
+        try:
+            yield
+        finally:
+            with self.cond:
+                self.checkpointing = False
+                self.cond.notify_all()
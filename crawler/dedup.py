@@ -0,0 +1,138 @@
+import os
+from collections import Counter
+from hashlib import blake2b
+from threading import Lock
+
+
+def simhash(words):
+    ''' 64-bit SimHash of a list of words, weighted by word counts. '''
+    weights = [0] * 64
+    for word, count in Counter(words).items():
+        h = int.from_bytes(blake2b(word.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            if h >> bit & 1:
+                weights[bit] += count
+            else:
+                weights[bit] -= count
+    fingerprint = 0
+    for bit in range(64):
+        if weights[bit] > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def page_fingerprint(words):
+    ''' SimHash that ContentIndex.check compares for a page, or None if the
+    page is too short for one. Lets it be computed outside the index. '''
+    if len(words) < ContentIndex.MIN_SIMHASH_WORDS:
+        return None
+    return simhash(words)
+
+
+class ContentIndex(object):
+    ''' Finds pages whose content was already crawled under another url.
+
+    Exact duplicates are found by the hash of a page's normalized text, near
+    duplicates by a SimHash of its words within `max_distance` bits. The
+    SimHash is split into max_distance + 1 bands and indexed per band: two
+    fingerprints within the distance agree on at least one whole band, so only
+    pages sharing a band are compared. Every page added is appended to `path`
+    as a line "<text hash> <simhash> <url>", in batches of `save_every` pages
+    and on save, and the index is rebuilt from these lines when a crawl is
+    resumed.
+    '''
+    MIN_SIMHASH_WORDS = 20
+    HEADER = b"content index 1\n"
+
+    def __init__(self, path, max_distance=3, restart=False, save_every=1000):
+        self.path = path
+        self.max_distance = max_distance
+        self.save_every = save_every
+        self.lock = Lock()
+        self.file_lock = Lock()
+        self.pending = []
+        bands = max_distance + 1
+        self.bands = [
+            (64 * i // bands, 64 * (i + 1) // bands - 64 * i // bands)
+            for i in range(bands)]
+        self.exact = dict()
+        self.tables = [dict() for _ in self.bands]
+        resume = False
+        if not restart and os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                # An index written in another format is rebuilt from scratch.
+                resume = f.readline() == self.HEADER
+                if resume:
+                    self._load(f)
+        self.file = open(self.path, "ab" if resume else "wb")
+        if not resume:
+            self.file.write(self.HEADER)
+
+    def _load(self, f):
+        for line in f:
+            parts = line.rstrip(b"\n").split(b" ", 2)
+            if len(parts) != 3:
+                # Last line of a crawl that stopped while writing it.
+                continue
+            digest, fingerprint, url = parts
+            self._add(
+                None if digest == b"-" else bytes.fromhex(digest.decode()),
+                None if fingerprint == b"-" else int(fingerprint),
+                url.decode("utf-8"))
+
+    def _keys(self, fingerprint):
+        if fingerprint is None:
+            return []
+        return [fingerprint >> shift & ((1 << width) - 1) for shift, width in self.bands]
+
+    def _add(self, digest, fingerprint, url):
+        if digest is not None:
+            self.exact[digest] = url
+        for table, key in zip(self.tables, self._keys(fingerprint)):
+            table.setdefault(key, []).append((fingerprint, url))
+
+    def check(self, url, words, text_hash=None, fingerprint=None):
+        ''' Add the page to the index, or return why it is a duplicate.
+        text_hash is the hash of the normalized text that scraper.scraper
+        returns; without it only near duplicates are found. fingerprint is
+        page_fingerprint(words) if it was already computed. '''
+        if not words:
+            return None
+        if fingerprint is None:
+            fingerprint = page_fingerprint(words)
+        keys = self._keys(fingerprint)
+
+        with self.lock:
+            if text_hash is not None:
+                original = self.exact.get(text_hash)
+                if original == url:
+                    # The same page crawled again, e.g. after a resume.
+                    return None
+                if original is not None:
+                    return f"exact duplicate of {original}"
+            for table, key in zip(self.tables, keys):
+                for other, other_url in table.get(key, ()):
+                    if other_url != url and bin(fingerprint ^ other).count("1") <= self.max_distance:
+                        return f"near duplicate of {other_url}"
+
+            self._add(text_hash, fingerprint, url)
+            self.pending.append(
+                f"{text_hash.hex() if text_hash is not None else '-'} "
+                f"{fingerprint if fingerprint is not None else '-'} {url}\n")
+            save = len(self.pending) >= self.save_every
+        if save:
+            self.save()
+        return None
+
+    def save(self):
+        with self.lock:
+            lines, self.pending = self.pending, []
+        if lines:
+            with self.file_lock:
+                self.file.write("".join(lines).encode("utf-8"))
+                self.file.flush()
+
+    def close(self):
+        self.save()
+        with self.file_lock:
+            self.file.close()
@@ -1,153 +1,485 @@
 import os
-import shelve
-from collections import Counter
 from urllib.parse import urlparse
 
 from threading import Thread, Lock
-from queue import Queue, Empty
 
-from utils import get_logger, get_urlhash, normalize
+from utils import get_logger, get_urlhash, get_urlhash64, normalize
+from utils.metrics import REGISTRY, FRONTIER_LOCK_SECONDS, TimedLock
+from utils.output import OutputWriter
+from utils.hashset import HashSet64
+from utils.canonical import canonicalize
+from utils.download import download
 from scraper import is_valid
+from crawler.scheduler import HostScheduler
+from crawler.storage import WriteBehindSave, STORAGE_BACKENDS
+from crawler.word_stats import WordStats
+from crawler.dedup import ContentIndex
+from crawler.traps import TrapDetector
+from crawler.scoring import make_scorer
+from crawler.recrawl import PageCache
+from crawler.checkpoint import AnalyticsCheckpoint, CheckpointGate
+from crawler.robots import RobotsCache, sitemap_urls
+from crawler.linkgraph import LinkGraph, GraphReader
+
+
+class _Shard(object):
+    ''' Frontier state of the hosts that hash to one shard, under its own lock. '''
+    def __init__(self):
+        self.lock = TimedLock(FRONTIER_LOCK_SECONDS)
+        # 64-bit hashes of every url in the save file and of every filtered
+        # url, so duplicates are found without touching the disk.
+        self.seen_url = HashSet64(1 << 12)
+        self.seen_filtered_url = HashSet64(1 << 12)
+        # Spellings of urls that canonicalization rewrote, and how many times
+        # it merged a new spelling into an already known url.
+        self.seen_rewritten_url = HashSet64(1 << 12)
+        self.canonical_rewritten = 0
+        self.canonical_saved = 0
+        # Depth of the urls being downloaded, for the links found on them.
+        self.in_flight_depth = dict()
 
 
 class Frontier(object):
     def __init__(self, config, restart):
-        self.lock = Lock()
+        # Urls are sharded by host, so workers adding the links of different
+        # hosts do not wait on each other.
+        self.shards = [_Shard() for _ in range(config.frontier_shards)]
         self.counter_lock = Lock()
         self.logger = get_logger("FRONTIER")
         self.config = config
-        self.to_be_downloaded = list()
-        self.seen_filtered_url = set()
+        self.to_be_downloaded = HostScheduler(self.config.time_delay)
+        REGISTRY.gauge(
+            "crawler_frontier_urls", "Urls waiting to be downloaded per host.",
+            self.to_be_downloaded.host_sizes)
+        self.traps = TrapDetector(
+            self.logger, self.config.trap_max_depth, self.config.trap_max_repeats,
+            self.config.trap_template_budget, self.config.trap_param_budget,
+            self.config.trap_host_budget)
+        self.score = make_scorer(self.config.scoring)
         self.max_page_length = 0
         self.max_page_url = ""
-        self.max_len_page_file_name = "Logs/max_len_page.txt"
-        self.counter = Counter()
-        self.ics_domain = Counter()
+        # Unique pages downloaded with status 200 per host, as GraphReader
+        # counts them, for the report when no link graph is kept.
+        self.host_pages = dict()
+        os.makedirs(self.config.log_dir, exist_ok=True)
+        self.output = OutputWriter(self.config.output_flush)
+        self.max_len_page_file_name = f"{self.config.log_dir}/max_len_page.txt"
+        self.words = WordStats(self.config.top_words)
+        # Canonicalization counters of the crawl before it was resumed.
+        self.restored_rewritten = 0
+        self.restored_saved = 0
+        self.checkpoint_gate = CheckpointGate()
+        self.analytics = AnalyticsCheckpoint(
+            self.config.save_file + ".analytics", self._analytics_state,
+            self.config.checkpoint_interval)
+        self.page_cache = None
+        if self.config.page_cache:
+            # Kept across --restart so that a restarted crawl is incremental.
+            self.page_cache = PageCache(self.config.save_file + ".pages")
+        self.content_index = None
+        if self.config.duplicate_distance >= 0:
+            self.content_index = ContentIndex(
+                self.config.save_file + ".content",
+                self.config.duplicate_distance, restart)
+        self.link_graph = None
+        if self.config.link_graph:
+            self.link_graph = LinkGraph(self.config.save_file + ".graph", restart)
+        # Only the page cache and the link graph use the validators of a page.
+        self.hash_pages = self.page_cache is not None or self.link_graph is not None
+        # True while the save file is loaded in the background.
+        self.loading = False
+        self.loader = None
+        self.robots = None
+        if self.config.robots:
+            self.robots = RobotsCache(
+                self._fetch, self.config.user_agent, self.config.robots_ttl,
+                self.config.robots_cache, self._robots_loaded)
+        self.storage = STORAGE_BACKENDS[self.config.storage]
         
         if restart:
-            if os.path.exists(self.config.save_file + ".dat"):
+            if self.storage.exists(self.config.save_file):
                 self.logger.info(f"Found save file {self.config.save_file}, deleting it.")
-                self.save = shelve.open(self.config.save_file, flag="n")
-            self.url_file = open("Logs/url_list.txt", "w")
-            self.filtered_url = open("Logs/filtered_url.txt", "w")
+            self.save = self._open_save_file(flag="n")
+            self.url_file = self.output.open(f"{self.config.log_dir}/url_list.txt", "w")
+            self.filtered_url = self.output.open(f"{self.config.log_dir}/filtered_url.txt", "w")
             with open(self.max_len_page_file_name, "w") as f:
                 f.write(f"dummy {self.max_page_length}")
+            if os.path.exists(self.analytics.path):
+                os.remove(self.analytics.path)
         else:
-            if not os.path.exists(self.config.save_file + ".dat"):
+            if not self.storage.exists(self.config.save_file):
                 self.logger.info(f"Did not find save file {self.config.save_file}, "f"starting from seed.")
                 raise
                 
-            self.save = shelve.open(self.config.save_file)
-            self.url_file = open("Logs/url_list.txt", "a")
-            self.filtered_url = open("Logs/filtered_url.txt", "a")
+            self.save = self._open_save_file()
+            self.url_file = self.output.open(f"{self.config.log_dir}/url_list.txt", "a")
+            self.filtered_url = self.output.open(f"{self.config.log_dir}/filtered_url.txt", "a")
 
-            with open(self.max_len_page_file_name, "r") as f:
-                _, self.max_page_length = f.read().split()
-                self.max_page_length = int(self.max_page_length)    
+            checkpoint = self.analytics.load()
+            if checkpoint is not None:
+                self._restore_analytics(*checkpoint)
+            else:
+                # Save file of a crawl from before the analytics checkpoints.
+                with open(self.max_len_page_file_name, "r") as f:
+                    _, self.max_page_length = f.read().split()
+                    self.max_page_length = int(self.max_page_length)    
             
         
         if restart:
             for url in self.config.seed_urls:
                 self.add_url(url)
+            if self.robots is not None and self.config.sitemap_limit:
+                self._seed_sitemaps()
+        elif self.save.empty():
+            for url in self.config.seed_urls:
+                self.add_url(url)
+        elif self.config.fast_start:
+            # Serve urls while the rest of the save file is loaded.
+            self.loading = True
+            self.to_be_downloaded.add_producer()
+            self.loader = Thread(target=self._load_save_file, daemon=True)
+            self.loader.start()
         else:
             # Set the frontier state with contents of save file.
             self._parse_save_file()
-            if not self.save:
-                for url in self.config.seed_urls:
-                    self.add_url(url)
+        self.analytics.start()
         
 
+    def _open_save_file(self, flag="c"):
+        # Writes to the save file are batched by a background thread. The
+        # buffered url lists are written first, so a page completed in the
+        # save file is always in Logs/url_list.txt too.
+        return WriteBehindSave(
+            self.storage(self.config.save_file, flag=flag),
+            self.config.save_batch, self.config.save_interval, self.output.flush)
+
+    def _fetch(self, url):
+        # The caller holds the host of url in the scheduler.
+        return download(url, self.config, self.logger)
+
+    def _polite_fetch(self, url):
+        # Download a url that is not queued, e.g. a sitemap, after the
+        # politeness delay of its host.
+        netloc = urlparse(url).netloc
+        self.to_be_downloaded.acquire(netloc)
+        try:
+            return self._fetch(url)
+        finally:
+            self.to_be_downloaded.release(netloc)
+
+    def owns_host(self, netloc):
+        # Every host is crawled by this frontier unless the crawl is partitioned.
+        return True
+
+    def _robots_loaded(self, netloc, rules):
+        if rules.crawl_delay:
+            self.to_be_downloaded.set_delay(
+                netloc, min(rules.crawl_delay, self.config.robots_max_delay))
+
+    def _seed_sitemaps(self):
+        # Deep pages listed in the sitemaps of the seed hosts.
+        sitemaps = []
+        for url in self.config.seed_urls:
+            parsed = urlparse(url)
+            if not self.owns_host(parsed.netloc):
+                continue
+            self.to_be_downloaded.acquire(parsed.netloc)
+            try:
+                rules = self.robots.rules(url)
+            finally:
+                self.to_be_downloaded.release(parsed.netloc)
+            sitemaps.extend(rules.sitemaps or [f"{parsed.scheme}://{parsed.netloc}/sitemap.xml"])
+        count = 0
+        batch = []
+        for url in sitemap_urls(self._polite_fetch, sitemaps, self.config.sitemap_limit):
+            if is_valid(url):
+                batch.append(url)
+            if len(batch) >= 1000:
+                self.add_urls(batch, 1)
+                count += len(batch)
+                batch = []
+        self.add_urls(batch, 1)
+        count += len(batch)
+        self.logger.info(f"Found {count} urls in the sitemaps of the seed urls.")
+
+    def defer_for_robots(self, url):
+        ''' Download the robots.txt of the host of an in-flight url if it is
+        not cached yet. The url then goes back to the scheduler, so that the
+        page is only downloaded after the politeness delay (or Crawl-delay)
+        that follows robots.txt. Returns True if the url was deferred. '''
+        if self.robots is None or self.robots.cached(url) is not None:
+            return False
+        self.robots.rules(url)
+        shard = self._shard(url)
+        with shard.lock:
+            depth = shard.in_flight_depth.pop(url, None)
+        if depth is None:
+            return False
+        netloc = urlparse(url).netloc
+        # First in line for its host.
+        self.to_be_downloaded.add(netloc, (url, depth), float("-inf"))
+        self.to_be_downloaded.release(netloc)
+        return True
+
+    def robots_check(self, url):
+        ''' Why robots.txt does not allow url, or None. Fetches the robots.txt
+        of its host if it is not cached. '''
+        if self.robots is None or self.robots.rules(url).allowed(url):
+            return None
+        return "disallowed by robots.txt"
+
+    def _load_save_file(self):
+        try:
+            self._parse_save_file()
+        finally:
+            self.loading = False
+            self.to_be_downloaded.remove_producer()
+
     def _parse_save_file(self):
         ''' This function can be overridden for alternate saving techniques. '''
-        total_count = len(self.save)
+        # Pending urls first, so that downloads start while the hashes of the
+        # other urls are still being loaded.
         tbd_count = 0
-        for url, completed in self.save.values():
-            if not completed and is_valid(url):
-                self.to_be_downloaded.append(url)
-                tbd_count += 1
+        batch = []
+        for entry in self.save.pending_urls():
+            batch.append(entry)
+            if len(batch) >= 1000:
+                tbd_count += self._load_pending(batch)
+                batch = []
+        tbd_count += self._load_pending(batch)
+
+        total_count = 0
+        batch = []
+        for url in self.save.urls():
+            batch.append(url)
+            if len(batch) >= 10000:
+                self._load_seen(batch)
+                total_count += len(batch)
+                batch = []
+        self._load_seen(batch)
+        total_count += len(batch)
         self.logger.info(
             f"Found {tbd_count} urls to be downloaded from {total_count} "
             f"total urls discovered.")
 
-    def get_tbd_url(self):
-        self.lock.acquire()
-        try:
-            # queue
-            # TODO: keep polite with each domain
-            # check if domain is in the allowed set.
-            tbd_url = self.to_be_downloaded.pop(0)
-
-            parsed = urlparse(tbd_url)
-            netloc = parsed.netloc.lower()
-            if self.is_subdomain(netloc, "ics.uci.edu"):
-                pass
-            elif self.is_subdomain(netloc, "cs.uci.edu"):
-                pass
-            elif self.is_subdomain(netloc, "informatics.uci.edu"):
-                pass
-            elif self.is_subdomain(netloc, "stat.uci.edu"):
-                pass
-            elif (netloc + parsed.path).startswith("today.uci.edu/department/information_computer_sciences"):
-                pass
-            else:
-                raise ValueError(f"Invalid url {tbd_url}")
+    def _load_pending(self, entries):
+        # Only the urls that were not seen yet: add_urls may have scheduled
+        # the others while the save file is loaded in the background.
+        new = set(self._load_seen([url for url, _, _ in entries]))
+        scheduled = [
+            (urlparse(url).netloc, (url, depth), score)
+            for url, score, depth in entries if url in new and is_valid(url)]
+        self.to_be_downloaded.add_many(scheduled)
+        return len(scheduled)
+
+    def _load_seen(self, urls):
+        # Returns the urls that were not in seen_url yet.
+        new = []
+        for shard, shard_urls in self._by_shard(urls, lambda url: url):
+            with shard.lock:
+                for url in shard_urls:
+                    if shard.seen_url.add(get_urlhash64(url)):
+                        new.append(url)
+        return new
 
-            self.lock.release()
-            return tbd_url
-        except IndexError:
-            self.lock.release()
+    def get_tbd_url(self):
+        # Blocks until the politeness delay of some host has passed.
+        # Returns None when nothing is queued and no url is being downloaded.
+        entry = self.to_be_downloaded.get()
+        if entry is None:
             return None
+        host, (tbd_url, depth) = entry
+        shard = self._shard(tbd_url)
+        with shard.lock:
+            shard.in_flight_depth[tbd_url] = depth
+
+        # check if domain is in the allowed set.
+        parsed = urlparse(tbd_url)
+        netloc = host.lower()
+        if self.is_subdomain(netloc, "ics.uci.edu"):
+            pass
+        elif self.is_subdomain(netloc, "cs.uci.edu"):
+            pass
+        elif self.is_subdomain(netloc, "informatics.uci.edu"):
+            pass
+        elif self.is_subdomain(netloc, "stat.uci.edu"):
+            pass
+        elif (netloc + parsed.path).startswith("today.uci.edu/department/information_computer_sciences"):
+            pass
+        else:
+            self.to_be_downloaded.release(host)
+            raise ValueError(f"Invalid url {tbd_url}")
+
+        return tbd_url
 
     def is_subdomain(self, netloc, domain):
         return netloc == domain or netloc.endswith("."+ domain)
     
+    def _shard(self, url):
+        return self.shards[hash(urlparse(url).netloc) % len(self.shards)]
+
+    def _by_shard(self, entries, key):
+        shards = dict()
+        for entry in entries:
+            shard = self._shard(key(entry))
+            if shard in shards:
+                shards[shard].append(entry)
+            else:
+                shards[shard] = [entry]
+        return shards.items()
+
+    @property
+    def canonical_rewritten(self):
+        return self.restored_rewritten + sum(shard.canonical_rewritten for shard in self.shards)
+
+    @property
+    def canonical_saved(self):
+        return self.restored_saved + sum(shard.canonical_saved for shard in self.shards)
+
     def add_filtered_url(self, url_with_error: tuple):
-        self.lock.acquire()
-        url, error = url_with_error
-        if url not in self.seen_filtered_url:
-            self.filtered_url.write(f"{url}, {error}\n")
-            self.filtered_url.flush()
-            self.seen_filtered_url.add(url)
-        self.lock.release()
-
-    def add_url(self, url):
-        url = normalize(url)
-        urlhash = get_urlhash(url)
+        self.add_filtered_urls([url_with_error])
 
-        self.lock.acquire()
-        if urlhash not in self.save:
-            self.save[urlhash] = (url, False)
-            self.save.sync()
-            self.to_be_downloaded.append(url)
+    def add_filtered_urls(self, urls_with_errors):
+        lines = []
+        for shard, entries in self._by_shard(urls_with_errors, lambda entry: entry[0]):
+            with shard.lock:
+                for url, error in entries:
+                    if shard.seen_filtered_url.add(get_urlhash64(url)):
+                        lines.append(f"{url}, {error}\n")
+        if lines:
+            self.filtered_url.write("".join(lines))
+
+    def record_links(self, url, links):
+        if self.link_graph is not None:
+            self.link_graph.add_links(
+                url, [canonicalize(link, self.config.strip_params) for link in links])
+
+    def record_page(self, url, fetch, word_count):
+        # fetch is the (status, content hash, download seconds) of the page.
+        status, content_hash, latency = fetch
+        if status == 200:
+            netloc = urlparse(url).netloc.lower()
+            with self.counter_lock:
+                self.host_pages[netloc] = self.host_pages.get(netloc, 0) + 1
+        if self.link_graph is not None:
+            self.link_graph.add_page(url, status, word_count, content_hash, latency)
+
+    def url_depth(self, url):
+        # Distance from the seed urls of a url that is being downloaded.
+        return self._shard(url).in_flight_depth.get(url, 0)
+
+    def add_url(self, url, depth=0):
+        self.add_urls([url], depth)
 
+    def add_urls(self, urls, depth=0):
+        ''' Add the links found on a page, taking each shard lock once. '''
+        canonical = []
+        for url in urls:
+            canonical.append((normalize(url), canonicalize(url, self.config.strip_params)))
+
+        # Read before the seen check: once the load has finished, every url
+        # of the save file is in seen_url.
+        in_save = set()
+        if self.loading:
+            # The save file is still being loaded in the background. The urls
+            # it holds are left out of seen_url for the loader, which only
+            # schedules the pending urls it is the first to see.
+            in_save = {url for _, url in canonical if get_urlhash(url) in self.save}
+        new_urls = []
+        filtered = []
+        for shard, entries in self._by_shard(canonical, lambda entry: entry[1]):
+            with shard.lock:
+                for raw_url, url in entries:
+                    new = url not in in_save and shard.seen_url.add(get_urlhash64(url))
+                    if new:
+                        new_urls.append(url)
+                    if raw_url != url:
+                        shard.canonical_rewritten += 1
+                        # Without canonicalization this spelling would be one more download.
+                        if shard.seen_rewritten_url.add(get_urlhash64(raw_url)) and not new:
+                            shard.canonical_saved += 1
+
+        # Every new url is only seen by this call, so the save file and the
+        # scheduler are updated outside the shard locks.
+        records = []
+        scheduled = []
+        for url in new_urls:
+            trap = self.traps.check(url)
+            if trap:
+                filtered.append((url, trap))
+                continue
+            if self.robots is not None:
+                # Hosts whose robots.txt is not known yet are checked when
+                # their urls are fetched.
+                rules = self.robots.cached(url)
+                if rules is not None and not rules.allowed(url):
+                    filtered.append((url, "disallowed by robots.txt"))
+                    continue
             parsed = urlparse(url)
-            netloc = parsed.netloc
-            if netloc == "ics.uci.edu" or netloc.endswith(".ics.uci.edu"):
-                self.ics_domain[netloc] += 1
-        self.lock.release()
+            score = self.score(parsed, depth, self.traps)
+            records.append((get_urlhash(url), (url, False, score, depth)))
+            scheduled.append((parsed.netloc, (url, depth), score))
+        self.save.update(records)
+        self.to_be_downloaded.add_many(scheduled)
 
-        return
+        if filtered:
+            self.add_filtered_urls(filtered)
 
     def record_url(self, url):
         self.url_file.write(f"{url}\n")
-        self.url_file.flush()
 
     
     def mark_url_complete(self, url):
         urlhash = get_urlhash(url)
 
-        self.lock.acquire()
-        if urlhash not in self.save:
-            # This should not happen.
-            self.logger.error(
-                f"Completed url {url}, but have not seen it before.")
+        shard = self._shard(url)
+        with shard.lock:
+            if get_urlhash64(url) not in shard.seen_url:
+                # This should not happen.
+                self.logger.error(
+                    f"Completed url {url}, but have not seen it before.")
+            depth = shard.in_flight_depth.pop(url, None)
+        if depth is None:
+            # Already completed, or released after it failed.
+            return
+        try:
+            self.save[urlhash] = (url, True, 0, depth)
+        finally:
+            # Start the politeness delay of the host only once its page is done.
+            self.to_be_downloaded.release(urlparse(url).netloc)
 
-        self.save[urlhash] = (url, True)
-        self.save.sync()
-        self.lock.release()
+    def release_url(self, url):
+        ''' Give the host of an in-flight url back to the scheduler without
+        completing the url, e.g. when downloading or parsing it failed. The
+        url is crawled again on resume. Does nothing for a completed url. '''
+        shard = self._shard(url)
+        with shard.lock:
+            if shard.in_flight_depth.pop(url, None) is None:
+                return
+        self.to_be_downloaded.release(urlparse(url).netloc)
+
+    def cached_result(self, url, validators):
+        # Stored scraper result of an unchanged page, or None.
+        if self.page_cache is None:
+            return None
+        return self.page_cache.lookup(url, validators)
+
+    def cached_hash(self, url):
+        # Content hash of the stored result of url, or None.
+        if self.page_cache is None:
+            return None
+        return self.page_cache.content_hash(url)
+
+    def cache_result(self, url, validators, result):
+        if self.page_cache is not None:
+            self.page_cache.store(url, validators, result)
+
+    def check_duplicate(self, url, word_list, text_hash=None, fingerprint=None):
+        # Reason why the page is a duplicate of a crawled page, or None.
+        if self.content_index is None:
+            return None
+        return self.content_index.check(url, word_list, text_hash, fingerprint)
 
-        return 
-    
     def extract_info(self, url, word_list):
         self.counter_lock.acquire()
 
@@ -156,28 +488,106 @@ class Frontier(object):
         if self.max_page_length < page_len:
             self.max_page_length = page_len
             self.max_page_url = url
-            
-        
-        new_counter = Counter(word_list)
-        self.counter = self.counter + new_counter
 
         self.counter_lock.release()
 
+        # Counted per thread and merged into the totals in batches.
+        self.words.add(word_list)
+
 
     
+    def close(self):
+        # The last checkpoint syncs the save file, which is closed after it.
+        if self.loader is not None:
+            # The save file is still read when the crawl stops during the load.
+            self.loader.join()
+        self.analytics.stop()
+        self.save.close()
+        if self.content_index is not None:
+            self.content_index.close()
+        if self.page_cache is not None:
+            self.logger.info(f"Reused {self.page_cache.hits} unchanged pages.")
+            self.page_cache.close()
+        if self.link_graph is not None:
+            self.link_graph.close()
+        # Write the buffered url lists and reports.
+        self.output.close()
+
+    def page_update(self):
+        # Held while a crawled page is added, so checkpoints fall between pages.
+        return self.checkpoint_gate.update()
+
+    def _analytics_state(self):
+        # The save file is synced with no page half added, so the checkpoint
+        # counts exactly the pages that are completed on disk.
+        with self.checkpoint_gate.checkpoint():
+            self.save.sync()
+            self.output.flush()
+            if self.content_index is not None:
+                # Resumed crawls must find the duplicates of every page the
+                # save file counts as completed.
+                self.content_index.save()
+            if self.link_graph is not None:
+                # ics_domain.txt is counted from the graph after a resume.
+                self.link_graph.flush()
+            with self.counter_lock:
+                meta = {
+                    "max_page_url": self.max_page_url,
+                    "max_page_length": self.max_page_length,
+                    "host_pages": dict(self.host_pages)}
+            meta["traps"] = self.traps.snapshot()
+            meta["canonical_rewritten"] = self.canonical_rewritten
+            meta["canonical_saved"] = self.canonical_saved
+            terms, counts = self.words.snapshot()
+        return meta, terms, counts
+
+    def _restore_analytics(self, meta, terms, counts):
+        self.max_page_url = meta["max_page_url"]
+        self.max_page_length = meta["max_page_length"]
+        self.restored_rewritten = meta["canonical_rewritten"]
+        self.restored_saved = meta["canonical_saved"]
+        # Checkpoints from before the pages per host were kept have none.
+        self.host_pages = meta.get("host_pages", dict())
+        if "traps" in meta:
+            self.traps.restore(meta["traps"])
+        self.words.restore(terms, counts)
+        self.logger.info(
+            f"Restored the counts of {len(terms)} words from {self.analytics.path}.")
+
     def record_info(self):
-        with open(self.max_len_page_file_name, "w") as f:
-            f.write(f"{self.max_page_url} {self.max_page_length}")
+        # Reports are written by the output thread.
+        self.output.write_file(
+            self.max_len_page_file_name, f"{self.max_page_url} {self.max_page_length}")
         
         # Record 50 common words
-        with open("Logs/common_words.txt", "w") as f:
-            for (word, count) in self.counter.most_common(100):
-                f.write(f"{word}, {count}\n")
+        self.output.write_file(
+            f"{self.config.log_dir}/common_words.txt",
+            "".join(f"{word}, {count}\n" for (word, count) in self.words.most_common(100)))
+
+        self.output.write_file(
+            f"{self.config.log_dir}/canonical.txt",
+            f"rewritten links, {self.canonical_rewritten}\n"
+            f"downloads saved, {self.canonical_saved}\n")
 
         # Record subdomain of ics.uci.edu
-        with open("Logs/ics_domain.txt", "w") as f:
-            for (domain, count) in sorted(self.ics_domain.items()):
-                f.write(f"{domain}, {count}\n")
+        self.output.write_file(
+            f"{self.config.log_dir}/ics_domain.txt",
+            "".join(f"{domain}, {count}\n" for (domain, count)
+                    in sorted(self._subdomain_counts("ics.uci.edu").items())))
+
+    def _subdomain_counts(self, domain):
+        # Unique pages downloaded with status 200 per subdomain, from the link
+        # graph if it is kept.
+        if self.link_graph is None:
+            with self.counter_lock:
+                return {
+                    netloc: count for netloc, count in self.host_pages.items()
+                    if netloc == domain or netloc.endswith("." + domain)}
+        self.link_graph.flush()
+        graph = GraphReader(self.link_graph.path)
+        counts = graph.subdomain_counts(domain)
+        graph.close()
+        return counts
 
         
 
@@ -0,0 +1,38 @@
+''' Queries over the link graph of a crawl.
+
+Usage: python -m crawler.graph_query <graph path> top [-n 20]
+       python -m crawler.graph_query <graph path> subdomains [--domain ics.uci.edu]
+       python -m crawler.graph_query <graph path> stats
+'''
+import os
+import sys
+from argparse import ArgumentParser
+
+from crawler.linkgraph import GraphReader
+
+
+def main():
+    parser = ArgumentParser(usage=__doc__)
+    parser.add_argument("path")
+    parser.add_argument("query", choices=["top", "subdomains", "stats"])
+    parser.add_argument("-n", type=int, default=20)
+    parser.add_argument("--domain", default="ics.uci.edu")
+    args = parser.parse_args()
+    if not os.path.exists(args.path + ".urls"):
+        sys.exit(f"No link graph at {args.path}")
+
+    graph = GraphReader(args.path)
+    if args.query == "top":
+        for url, count in graph.top_in_linked(args.n):
+            print(f"{count}, {url}")
+    elif args.query == "subdomains":
+        for netloc, count in sorted(graph.subdomain_counts(args.domain).items()):
+            print(f"{netloc}, {count}")
+    else:
+        for name, value in graph.stats().items():
+            print(f"{name}, {value}")
+    graph.close()
+
+
+if __name__ == "__main__":
+    main()
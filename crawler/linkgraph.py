@@ -0,0 +1,214 @@
+''' Link graph and page metadata of a crawl, queried with crawler.graph_query. '''
+import os
+import mmap
+import struct
+from array import array
+from threading import Thread, Lock
+from urllib.parse import urlparse
+
+from utils import get_urlhash64
+from utils.hashset import HashMap64
+
+# Per-page record: url id, status, word count, 64-bit content hash, seconds
+# it took to download.
+PAGE = struct.Struct("<IIIQf")
+# Edge record header: source url id and the number of target ids after it.
+EDGES = struct.Struct("<II")
+
+
+class LinkGraph(object):
+    ''' Append-only store of the links and page metadata of a crawl.
+
+    Urls get compact integer ids in the order they are first seen and are
+    written one per line to `path.urls`, so the line number is the id.
+    `path.edges` holds for every crawled page its id, the number of links and
+    the ids of the linked urls as uint32, and `path.pages` holds fixed size
+    PAGE records. All three files are only appended to, in batches of
+    `flush_every` bytes, and can be memory mapped by GraphReader while the
+    crawl runs. On restart the files are truncated, otherwise the url ids
+    are read back from `path.urls` by a background thread, and the links and
+    pages recorded meanwhile are added once it is done. Ids are kept in a
+    HashMap64 keyed by the 64-bit url hash.
+    '''
+    def __init__(self, path, restart=False, flush_every=1 << 16):
+        self.path = path
+        self.flush_every = flush_every
+        self.lock = Lock()
+        self.ids = HashMap64()
+        # Records made while the ids are loaded, None once they are.
+        self.backlog = None
+        self.loader = None
+        self.url_buffer = []
+        self.edge_buffer = bytearray()
+        self.page_buffer = bytearray()
+        mode = "w" if restart else "a"
+        self.url_file = open(path + ".urls", mode, encoding="utf-8")
+        self.edge_file = open(path + ".edges", mode + "b")
+        self.page_file = open(path + ".pages", mode + "b")
+        if not restart:
+            self.backlog = []
+            self.loader = Thread(target=self._load_ids, daemon=True)
+            self.loader.start()
+
+    def _load_ids(self):
+        ids = HashMap64()
+        with open(self.path + ".urls", encoding="utf-8") as f:
+            for url_id, line in enumerate(f):
+                ids[get_urlhash64(line.rstrip("\n"))] = url_id
+        with self.lock:
+            self.ids = ids
+            for method, args in self.backlog:
+                method(*args)
+            self.backlog = None
+
+    def _id(self, url):
+        url_hash = get_urlhash64(url)
+        url_id = self.ids.get(url_hash)
+        if url_id is None:
+            url_id = len(self.ids)
+            self.ids[url_hash] = url_id
+            self.url_buffer.append(url + "\n")
+        return url_id
+
+    def add_links(self, url, links):
+        with self.lock:
+            if self.backlog is not None:
+                self.backlog.append((self._add_links, (url, links)))
+            else:
+                self._add_links(url, links)
+
+    def _add_links(self, url, links):
+        source = self._id(url)
+        targets = array("I", (self._id(link) for link in links))
+        self.edge_buffer += EDGES.pack(source, len(targets))
+        self.edge_buffer += targets.tobytes()
+        if len(self.edge_buffer) >= self.flush_every:
+            self._flush()
+
+    def add_page(self, url, status, word_count, content_hash, latency):
+        with self.lock:
+            args = (url, status, word_count, content_hash, latency)
+            if self.backlog is not None:
+                self.backlog.append((self._add_page, args))
+            else:
+                self._add_page(*args)
+
+    def _add_page(self, url, status, word_count, content_hash, latency):
+        self.page_buffer += PAGE.pack(
+            self._id(url), status, word_count, content_hash, latency)
+        if len(self.page_buffer) >= self.flush_every:
+            self._flush()
+
+    def _flush(self):
+        # Urls first, so every id in the other files is already known.
+        self.url_file.write("".join(self.url_buffer))
+        self.url_file.flush()
+        self.edge_file.write(self.edge_buffer)
+        self.edge_file.flush()
+        self.page_file.write(self.page_buffer)
+        self.page_file.flush()
+        self.url_buffer = []
+        self.edge_buffer = bytearray()
+        self.page_buffer = bytearray()
+
+    def flush(self):
+        self._wait_loaded()
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        self._wait_loaded()
+        with self.lock:
+            self._flush()
+            self.url_file.close()
+            self.edge_file.close()
+            self.page_file.close()
+
+    def _wait_loaded(self):
+        if self.loader is not None:
+            self.loader.join()
+
+
+def _map(path):
+    # Read-only memory map of a file, None if it is empty.
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class GraphReader(object):
+    ''' Queries over the files of a LinkGraph, read through memory maps. '''
+    def __init__(self, path):
+        with open(path + ".urls", encoding="utf-8") as f:
+            self.urls = f.read().splitlines()
+        self.edges = _map(path + ".edges")
+        self.pages = _map(path + ".pages")
+
+    def iter_edges(self):
+        ''' (source id, memoryview of target ids) of every crawled page. '''
+        if self.edges is None:
+            return
+        view = memoryview(self.edges)
+        offset = 0
+        while offset + EDGES.size <= len(view):
+            source, count = EDGES.unpack_from(view, offset)
+            offset += EDGES.size
+            end = offset + 4 * count
+            if end > len(view):
+                # The crawl is still writing this record.
+                return
+            yield source, view[offset:end].cast("I")
+            offset = end
+
+    def iter_pages(self):
+        if self.pages is None:
+            return
+        usable = len(self.pages) - len(self.pages) % PAGE.size
+        yield from PAGE.iter_unpack(memoryview(self.pages)[:usable])
+
+    def in_link_counts(self):
+        ''' Number of distinct pages linking to each url id. '''
+        counts = array("I", bytes(4 * len(self.urls)))
+        for source, targets in self.iter_edges():
+            for target in set(targets):
+                if target != source and target < len(counts):
+                    counts[target] += 1
+        return counts
+
+    def top_in_linked(self, n=20):
+        counts = self.in_link_counts()
+        top = sorted(range(len(counts)), key=counts.__getitem__, reverse=True)[:n]
+        return [(self.urls[i], counts[i]) for i in top if counts[i]]
+
+    def subdomain_counts(self, domain):
+        ''' Number of unique pages downloaded with status 200 per subdomain. '''
+        seen = bytearray(len(self.urls))
+        counts = dict()
+        for url_id, status, _, _, _ in self.iter_pages():
+            if status != 200 or url_id >= len(seen) or seen[url_id]:
+                continue
+            seen[url_id] = 1
+            netloc = urlparse(self.urls[url_id]).netloc.lower()
+            if netloc == domain or netloc.endswith("." + domain):
+                counts[netloc] = counts.get(netloc, 0) + 1
+        return counts
+
+    def stats(self):
+        pages = 0
+        words = 0
+        latency = 0.0
+        for _, status, word_count, _, seconds in self.iter_pages():
+            pages += 1
+            words += word_count
+            latency += seconds
+        edges = sum(len(targets) for _, targets in self.iter_edges())
+        return {
+            "urls": len(self.urls), "pages": pages, "links": edges,
+            "mean words": round(words / pages, 1) if pages else 0,
+            "mean download seconds": round(latency / pages, 3) if pages else 0}
+
+    def close(self):
+        for mapped in (self.edges, self.pages):
+            if mapped is not None:
+                mapped.close()
@@ -0,0 +1,247 @@
+import time
+import bisect
+from hashlib import blake2b
+from threading import Thread, Lock, Condition
+from urllib.parse import urlparse
+from multiprocessing.connection import Listener, Client
+
+from crawler.frontier import Frontier
+from utils.canonical import canonicalize
+
+
+def _hash(key):
+    return int.from_bytes(blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing(object):
+    ''' Consistent hashing of hosts onto crawler nodes. '''
+    def __init__(self, nodes, replicas=64):
+        points = sorted(
+            (_hash(f"node{node}-{replica}"), node)
+            for node in range(nodes) for replica in range(replicas))
+        self.keys = [key for key, _ in points]
+        self.nodes = [node for _, node in points]
+
+    def owner(self, netloc):
+        i = bisect.bisect(self.keys, _hash(netloc)) % len(self.keys)
+        return self.nodes[i]
+
+
+class PartitionedFrontier(Frontier):
+    ''' Frontier of one node in a multi-node crawl.
+
+    Hosts are partitioned over NODES crawler processes by consistent hashing
+    of their netloc, so each node downloads only its own hosts and keeps
+    their politeness state, save file and reports. Links to hosts of another
+    node are batched and sent to that node every `flush_interval` seconds over
+    a multiprocessing connection to NODEHOST:NODEPORT + node id, where NODEHOST
+    is one address for all nodes or the address of every node.
+
+    No node stops on its own. Every node counts the batches of links it sent
+    and received, and node 0 asks all nodes for their counts and whether they
+    are idle. When two such rounds find every node idle and the same, equal
+    totals of sent and received batches, no links are in transit and node 0
+    tells all nodes to stop. A node that does not answer a round within
+    NODEIDLE seconds fails that round.
+    '''
+    def __init__(self, config, restart, flush_interval=1.0):
+        # Seed urls are added during Frontier.__init__, so set up routing first.
+        self.config = config
+        self.node_id = config.node_id
+        self.ring = HashRing(config.nodes)
+        self.outbox = {node: [] for node in range(config.nodes) if node != self.node_id}
+        self.outbox_lock = Lock()
+        self.send_lock = Lock()
+        self.connections = dict()
+        self.flush_interval = flush_interval
+        self.authkey = config.user_agent.encode("utf-8")
+        # Batches of links sent to and received from other nodes.
+        self.sent = 0
+        self.received = 0
+        self.stopped = False
+        self.status = Condition()
+        self.round = 0
+        self.answers = dict()
+        self.listener = Listener(self._address(self.node_id), authkey=self.authkey)
+        super().__init__(config, restart)
+        Thread(target=self._accept, daemon=True).start()
+        Thread(target=self._send, daemon=True).start()
+        if self.node_id == 0:
+            Thread(target=self._detect_termination, daemon=True).start()
+
+    def add_urls(self, urls, depth=0):
+        local = []
+        remote = []
+        for url in urls:
+            netloc = urlparse(canonicalize(url, self.config.strip_params)).netloc
+            node = self.ring.owner(netloc)
+            if node == self.node_id:
+                local.append(url)
+            else:
+                remote.append((node, (url, depth)))
+        if remote:
+            with self.outbox_lock:
+                for node, entry in remote:
+                    self.outbox[node].append(entry)
+        super().add_urls(local, depth)
+
+    def owns_host(self, netloc):
+        return self.ring.owner(netloc) == self.node_id
+
+    def get_tbd_url(self):
+        while True:
+            tbd_url = super().get_tbd_url()
+            if tbd_url is not None:
+                return tbd_url
+            # Other nodes may still send links for our hosts.
+            self.flush_outbox()
+            if self.stopped:
+                return None
+            time.sleep(self.flush_interval)
+
+    def flush_outbox(self):
+        with self.send_lock:
+            with self.outbox_lock:
+                batches = {node: batch for node, batch in self.outbox.items() if batch}
+                for node in batches:
+                    self.outbox[node] = []
+                # Counted before they are sent, so a batch in transit is
+                # never counted as received but not as sent.
+                self.sent += len(batches)
+            for node, batch in batches.items():
+                try:
+                    self._connection(node).send(("urls", batch))
+                except OSError as e:
+                    # The node is not up yet; try again later.
+                    self.logger.warning(f"Could not send {len(batch)} urls to node {node}: {e}")
+                    self.connections.pop(node, None)
+                    with self.outbox_lock:
+                        self.outbox[node][:0] = batch
+                        self.sent -= 1
+
+    def close(self):
+        self.flush_outbox()
+        super().close()
+
+    def _idle(self):
+        with self.outbox_lock:
+            if any(self.outbox.values()):
+                return False
+        return self.to_be_downloaded.idle()
+
+    def _message(self, node, message):
+        # Send a control message; False if the node cannot be reached.
+        with self.send_lock:
+            try:
+                self._connection(node).send(message)
+                return True
+            except OSError:
+                self.connections.pop(node, None)
+                return False
+
+    def _connection(self, node):
+        connection = self.connections.get(node)
+        if connection is None:
+            connection = self.connections[node] = Client(
+                self._address(node), authkey=self.authkey)
+        return connection
+
+    def _address(self, node):
+        hosts = self.config.node_hosts
+        return (hosts[node] if len(hosts) > 1 else hosts[0], self.config.node_port + node)
+
+    def _send(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush_outbox()
+
+    def _accept(self):
+        while True:
+            connection = self.listener.accept()
+            Thread(target=self._receive, args=(connection,), daemon=True).start()
+
+    def _receive(self, connection):
+        while True:
+            try:
+                kind, *message = connection.recv()
+            except (EOFError, OSError):
+                connection.close()
+                return
+            if kind == "urls":
+                self._add_received(message[0])
+            elif kind == "status":
+                # A round of the termination check of node 0.
+                with self.outbox_lock:
+                    sent, received = self.sent, self.received
+                self._message(0, ("answer", self.node_id, message[0], self._idle(), sent, received))
+            elif kind == "answer":
+                node, round_id, idle, sent, received = message
+                with self.status:
+                    if round_id == self.round:
+                        self.answers[node] = (idle, sent, received)
+                        self.status.notify_all()
+            elif kind == "stop":
+                self.stopped = True
+
+    def _add_received(self, batch):
+        by_depth = dict()
+        for url, depth in batch:
+            by_depth.setdefault(depth, []).append(url)
+        for depth, urls in by_depth.items():
+            super().add_urls(urls, depth)
+        # Only counted once the urls are in the frontier, so the node is not
+        # idle with a batch that is received but not yet added.
+        with self.outbox_lock:
+            self.received += 1
+
+    def _status_round(self):
+        # (idle, sent, received) of every node, or None if one did not answer.
+        with self.status:
+            self.round += 1
+            self.answers = dict()
+            round_id = self.round
+        for node in range(1, self.config.nodes):
+            self._message(node, ("status", round_id))
+        with self.outbox_lock:
+            sent, received = self.sent, self.received
+        answers = {0: (self._idle(), sent, received)}
+        deadline = time.monotonic() + self.config.node_idle
+        with self.status:
+            while len(self.answers) < self.config.nodes - 1:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.status.wait(remaining)
+            answers.update(self.answers)
+        return answers
+
+    def _detect_termination(self):
+        previous = None
+        while not self.stopped:
+            time.sleep(self.flush_interval)
+            if not self._idle():
+                previous = None
+                continue
+            answers = self._status_round()
+            if answers is None or not all(idle for idle, _, _ in answers.values()):
+                previous = None
+                continue
+            totals = (
+                sum(sent for _, sent, _ in answers.values()),
+                sum(received for _, _, received in answers.values()))
+            if totals[0] == totals[1] and totals == previous:
+                self._stop_all()
+                return
+            previous = totals
+
+    def _stop_all(self):
+        pending = set(range(1, self.config.nodes))
+        deadline = time.monotonic() + self.config.node_idle
+        while pending and time.monotonic() < deadline:
+            pending = {node for node in pending if not self._message(node, ("stop",))}
+            if pending:
+                time.sleep(self.flush_interval)
+        if pending:
+            self.logger.error(f"Could not tell nodes {sorted(pending)} to stop.")
+        self.logger.info("All nodes are idle and no links are in transit. Stopping.")
+        self.stopped = True
@@ -0,0 +1,253 @@
+import os
+import time
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from queue import Queue
+from threading import Thread, BoundedSemaphore
+
+import scraper
+from utils import get_logger
+from utils.metrics import REGISTRY
+from utils.download import download
+from utils.async_download import AsyncDownloader
+from crawler import Crawler
+from crawler.worker import check_scraper_source, merge_scraped, reject_page, fetch_info
+from crawler.recrawl import get_validators
+from crawler.dedup import page_fingerprint
+
+
+_parser_logger = None
+
+
+def scrape_page(url, resp, parser, hash_page=False, cached_hash=None, fingerprint_page=False):
+    # Runs in a pool process: the CPU bound part of a worker. The page is
+    # decoded and hashed here too, and not parsed if its hash is cached_hash.
+    # Returns (result or None if unchanged, validators, SimHash of the words
+    # or None, metrics recorded).
+    global _parser_logger
+    if _parser_logger is None:
+        _parser_logger = get_logger(f"Parser-{os.getpid()}", "Parser")
+    validators = get_validators(resp) if hash_page else None
+    if validators is not None and validators["content_hash"] == cached_hash:
+        return None, validators, None, REGISTRY.drain()
+    result = scraper.scraper(url, resp, _parser_logger, parser)
+    fingerprint = None
+    if fingerprint_page and result[0]:
+        fingerprint = page_fingerprint(result[3])
+    return result, validators, fingerprint, REGISTRY.drain()
+
+
+def submit_page(frontier, pool, results, url, resp, parser, latency=0.0):
+    future = pool.submit(
+        scrape_page, url, resp, parser,
+        frontier.hash_pages, frontier.cached_hash(url),
+        frontier.content_index is not None)
+    results.put((url, resp.status, latency, future))
+
+
+class FetchWorker(Thread):
+    ''' Downloads urls and hands the responses to the parser pool. '''
+    def __init__(self, worker_id, config, frontier, pool, results, slots):
+        self.logger = get_logger(f"Fetcher-{worker_id}", f"Fetcher{worker_id}")
+        self.config = config
+        self.frontier = frontier
+        self.pool = pool
+        self.results = results
+        self.slots = slots
+        super().__init__(daemon=True)
+
+    def run(self):
+        while True:
+            tbd_url = self.frontier.get_tbd_url()
+            if not tbd_url:
+                self.logger.info("Frontier is empty. Stopping Fetcher.")
+                break
+            try:
+                self.fetch(tbd_url)
+            except Exception:
+                self.logger.exception(f"Failed to fetch {tbd_url}.")
+                self.frontier.release_url(tbd_url)
+
+    def fetch(self, tbd_url):
+        valid, reason = scraper.check_url(tbd_url)
+        if not valid:
+            self.frontier.add_filtered_url((tbd_url, f"{reason} (already inserted in the queue)"))
+            self.frontier.mark_url_complete(tbd_url)
+            return
+        if self.frontier.defer_for_robots(tbd_url):
+            return
+        reason = self.frontier.robots_check(tbd_url)
+        if reason:
+            self.frontier.add_filtered_url((tbd_url, reason))
+            self.frontier.mark_url_complete(tbd_url)
+            return
+
+        start = time.perf_counter()
+        resp = download(tbd_url, self.config, self.logger)
+        latency = time.perf_counter() - start
+        self.logger.info(
+            f"Downloaded {tbd_url}, status <{resp.status}>, "
+            f"using cache {self.config.cache_server}.")
+        if reject_page(self.frontier, tbd_url, resp, self.config.max_body_size, latency):
+            return
+
+        # Wait for a free slot so parsed pages do not pile up in memory.
+        self.slots.acquire()
+        try:
+            submit_page(
+                self.frontier, self.pool, self.results,
+                tbd_url, resp, self.config.parser, latency)
+        except Exception:
+            self.slots.release()
+            raise
+
+
+class AsyncFetchWorker(Thread):
+    ''' Downloads MAXINFLIGHT urls at a time on an asyncio event loop. '''
+    def __init__(self, worker_id, config, frontier, pool, results, slots):
+        self.logger = get_logger(f"Fetcher-{worker_id}", f"Fetcher{worker_id}")
+        self.config = config
+        self.frontier = frontier
+        self.pool = pool
+        self.results = results
+        self.slots = slots
+        super().__init__(daemon=True)
+
+    def run(self):
+        asyncio.run(self._run())
+
+    async def _run(self):
+        downloader = AsyncDownloader(self.config, self.logger)
+        # The frontier and the slots block, so they are waited on in threads.
+        blocking = ThreadPoolExecutor(self.config.max_in_flight)
+        try:
+            await asyncio.gather(*(
+                self._fetch(downloader, blocking)
+                for _ in range(self.config.max_in_flight)))
+        finally:
+            await downloader.close()
+            blocking.shutdown()
+        self.logger.info("Frontier is empty. Stopping Fetcher.")
+
+    async def _fetch(self, downloader, blocking):
+        loop = asyncio.get_running_loop()
+        while True:
+            tbd_url = await loop.run_in_executor(blocking, self.frontier.get_tbd_url)
+            if not tbd_url:
+                break
+            try:
+                await self._crawl(downloader, blocking, tbd_url)
+            except Exception:
+                self.logger.exception(f"Failed to fetch {tbd_url}.")
+                self.frontier.release_url(tbd_url)
+
+    async def _crawl(self, downloader, blocking, tbd_url):
+        loop = asyncio.get_running_loop()
+        valid, reason = scraper.check_url(tbd_url)
+        if not valid:
+            self.frontier.add_filtered_url((tbd_url, f"{reason} (already inserted in the queue)"))
+            self.frontier.mark_url_complete(tbd_url)
+            return
+        if await loop.run_in_executor(blocking, self.frontier.defer_for_robots, tbd_url):
+            return
+        reason = await loop.run_in_executor(
+            blocking, self.frontier.robots_check, tbd_url)
+        if reason:
+            self.frontier.add_filtered_url((tbd_url, reason))
+            self.frontier.mark_url_complete(tbd_url)
+            return
+
+        start = time.perf_counter()
+        resp = await downloader.download(tbd_url)
+        latency = time.perf_counter() - start
+        self.logger.info(
+            f"Downloaded {tbd_url}, status <{resp.status}>, "
+            f"using cache {self.config.cache_server}.")
+        if reject_page(self.frontier, tbd_url, resp, self.config.max_body_size, latency):
+            return
+
+        await loop.run_in_executor(blocking, self.slots.acquire)
+        try:
+            submit_page(
+                self.frontier, self.pool, self.results,
+                tbd_url, resp, self.config.parser, latency)
+        except Exception:
+            self.slots.release()
+            raise
+
+
+FETCHERS = {
+    "thread": FetchWorker,
+    "asyncio": AsyncFetchWorker,
+}
+
+
+class PipelineCrawler(Crawler):
+    ''' Crawler that downloads in threads and parses in a process pool.
+
+    THREADCOUNT fetch threads download pages and submit them to a pool of
+    PROCESSCOUNT processes running scraper.scraper. A single merge thread
+    adds the results to the frontier in the order they were submitted.
+    With FETCHER = asyncio, one thread downloads MAXINFLIGHT urls at a time
+    over a pool of keep-alive connections instead.
+    '''
+    def __init__(self, config, restart, **kwargs):
+        super().__init__(config, restart, **kwargs)
+        check_scraper_source()
+        self.processes = config.process_count or os.cpu_count()
+        self.pool = None
+        self.results = Queue()
+        self.slots = BoundedSemaphore(2 * self.processes)
+        self.merger = Thread(target=self._merge, daemon=True)
+
+    def start_async(self):
+        # Spawn instead of fork: the frontier already runs threads.
+        self.pool = ProcessPoolExecutor(
+            self.processes, mp_context=multiprocessing.get_context("spawn"))
+        self.merger.start()
+        fetcher = FETCHERS[self.config.fetcher]
+        fetchers_count = self.config.threads_count if fetcher is FetchWorker else 1
+        self.workers = [
+            fetcher(
+                worker_id, self.config, self.frontier,
+                self.pool, self.results, self.slots)
+            for worker_id in range(fetchers_count)]
+        for worker in self.workers:
+            worker.start()
+
+    def join(self):
+        super().join()
+        self.results.put(None)
+        self.merger.join()
+        self.pool.shutdown()
+
+    def _merge(self):
+        while True:
+            item = self.results.get()
+            if item is None:
+                break
+            url, status, latency, future = item
+            validators = None
+            fingerprint = None
+            try:
+                result, validators, fingerprint, metrics = future.result()
+                REGISTRY.merge(metrics)
+                if result is None:
+                    # The page did not change since the last crawl.
+                    result = self.frontier.cached_result(url, validators)
+                    if result is None:
+                        raise ValueError("page cache entry is gone")
+                else:
+                    self.frontier.cache_result(url, validators, result)
+            except Exception as e:
+                self.logger.error(f"Failed to parse {url}: {e}")
+                result = (False, [], [(url, f"parse error {e}")], [], None)
+            fetch = fetch_info(status, validators, latency)
+            try:
+                merge_scraped(self.frontier, url, result, fetch, fingerprint)
+            except Exception:
+                self.logger.exception(f"Failed to merge {url}.")
+            finally:
+                self.frontier.release_url(url)
+                self.slots.release()
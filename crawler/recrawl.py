@@ -0,0 +1,68 @@
+import time
+import shelve
+from hashlib import sha1
+from threading import Lock
+
+from utils import get_urlhash
+
+
+def get_validators(resp):
+    ''' ETag, Last-Modified and content hash of a downloaded page. '''
+    raw_response = resp.raw_response
+    if resp.status != 200 or raw_response is None:
+        return None
+    headers = getattr(raw_response, "headers", None) or {}
+    return {
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+        "content_hash": sha1(raw_response.content).hexdigest(),
+    }
+
+
+class PageCache(object):
+    ''' Scraper results of crawled pages, reused when a page did not change.
+
+    For every page it keeps the validators of the response (ETag,
+    Last-Modified, content hash), the time it was fetched and what
+    scraper.scraper returned. The cache server only takes the url and the user
+    agent, so the validators cannot be sent as a conditional request; instead a
+    page whose content hash matches the stored one is not parsed or tokenized
+    again and its stored links and words are used. The cache is a shelve at
+    `path` that is kept across --restart, so a restarted crawl is incremental.
+    '''
+    def __init__(self, path):
+        self.lock = Lock()
+        self.save = shelve.open(path)
+        self.hits = 0
+
+    def lookup(self, url, validators):
+        if validators is None:
+            return None
+        with self.lock:
+            entry = self.save.get(get_urlhash(url))
+            if entry is None or entry["content_hash"] != validators["content_hash"]:
+                return None
+            if len(entry["result"]) != 5:
+                # Stored before the scraper returned the hash of the text.
+                return None
+            self.hits += 1
+        return entry["result"]
+
+    def content_hash(self, url):
+        ''' Content hash of the stored result of url, or None. '''
+        with self.lock:
+            entry = self.save.get(get_urlhash(url))
+        if entry is None or len(entry["result"]) != 5:
+            return None
+        return entry["content_hash"]
+
+    def store(self, url, validators, result):
+        if validators is None or not result[0]:
+            return
+        entry = dict(validators, fetched_at=time.time(), result=result)
+        with self.lock:
+            self.save[get_urlhash(url)] = entry
+
+    def close(self):
+        with self.lock:
+            self.save.close()
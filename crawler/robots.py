@@ -0,0 +1,192 @@
+import re
+import io
+import gzip
+import time
+from collections import OrderedDict
+from threading import Lock
+from urllib.parse import urlparse, urljoin
+from xml.etree.ElementTree import iterparse, ParseError
+
+
+def _compile(pattern):
+    # robots.txt path pattern: * matches anything, a trailing $ anchors it.
+    anchored = pattern.endswith("$")
+    if anchored:
+        pattern = pattern[:-1]
+    regex = ".*".join(re.escape(part) for part in pattern.split("*"))
+    return re.compile(regex + ("$" if anchored else ""))
+
+
+class RobotsRules(object):
+    ''' The rules of one robots.txt that apply to user_agent.
+
+    The group whose User-agent is the longest substring of user_agent is
+    used, or the * group. Like the major search engines, the longest matching
+    Allow or Disallow pattern wins and Allow wins ties.
+    '''
+    def __init__(self, text, user_agent):
+        self.sitemaps = []
+        self.crawl_delay = None
+        groups = []
+        agents = []
+        rules = None
+        for line in text.splitlines():
+            key, _, value = line.split("#", 1)[0].partition(":")
+            key = key.strip().lower()
+            value = value.strip()
+            if key == "user-agent":
+                if rules is not None:
+                    agents, rules = [], None
+                agents.append(value.lower())
+            elif key in ("allow", "disallow", "crawl-delay"):
+                if rules is None:
+                    rules = {"rules": [], "delay": None}
+                    groups.append((agents, rules))
+                if key == "crawl-delay":
+                    try:
+                        rules["delay"] = float(value)
+                    except ValueError:
+                        pass
+                elif value:
+                    rules["rules"].append((len(value), key == "allow", _compile(value)))
+            elif key == "sitemap" and value:
+                self.sitemaps.append(value)
+
+        user_agent = user_agent.lower()
+        best = None
+        best_length = -1
+        for agents, rules in groups:
+            for agent in agents:
+                if agent == "*":
+                    length = 0
+                elif agent in user_agent:
+                    length = len(agent)
+                else:
+                    continue
+                if length > best_length:
+                    best, best_length = rules, length
+        self.rules = []
+        if best is not None:
+            # Longest pattern first, Allow before Disallow of the same length.
+            self.rules = sorted(best["rules"], key=lambda rule: (-rule[0], not rule[1]))
+            self.crawl_delay = best["delay"]
+
+    def allowed(self, url):
+        parsed = urlparse(url)
+        path = parsed.path or "/"
+        if parsed.query:
+            path += "?" + parsed.query
+        for _, allow, pattern in self.rules:
+            if pattern.match(path):
+                return allow
+        return True
+
+
+class RobotsCache(object):
+    ''' Parsed robots.txt rules per host, fetched on first use.
+
+    `fetch(url)` downloads a url and returns a Response. Rules expire after
+    `ttl` seconds and the least recently used host is evicted once more than
+    `max_hosts` are cached (None or 0 for no limit). A robots.txt that cannot be downloaded allows
+    everything. `on_load(netloc, rules)` is called whenever rules are fetched.
+    '''
+    def __init__(self, fetch, user_agent, ttl=86400, max_hosts=1024, on_load=None):
+        self.fetch = fetch
+        self.user_agent = user_agent
+        self.ttl = ttl
+        self.max_hosts = max_hosts
+        self.on_load = on_load
+        self.lock = Lock()
+        self.hosts = OrderedDict()
+        self.fetching = dict()
+
+    def cached(self, url):
+        ''' Rules of the host of url if they are cached, without fetching. '''
+        netloc = urlparse(url).netloc
+        with self.lock:
+            entry = self.hosts.get(netloc)
+            if entry is None or entry[0] < time.monotonic():
+                return None
+            self.hosts.move_to_end(netloc)
+            return entry[1]
+
+    def rules(self, url):
+        rules = self.cached(url)
+        if rules is not None:
+            return rules
+        parsed = urlparse(url)
+        with self.lock:
+            # Only one thread downloads the robots.txt of a host.
+            host_lock = self.fetching.setdefault(parsed.netloc, Lock())
+        with host_lock:
+            rules = self.cached(url)
+            if rules is None:
+                rules = self._load(parsed)
+        with self.lock:
+            self.fetching.pop(parsed.netloc, None)
+        return rules
+
+    def _load(self, parsed):
+        resp = self.fetch(f"{parsed.scheme}://{parsed.netloc}/robots.txt")
+        text = ""
+        if resp.status == 200 and resp.raw_response is not None:
+            text = str(resp.raw_response.content, "utf-8", "replace")
+        rules = RobotsRules(text, self.user_agent)
+        with self.lock:
+            self.hosts[parsed.netloc] = (time.monotonic() + self.ttl, rules)
+            self.hosts.move_to_end(parsed.netloc)
+            while self.max_hosts and len(self.hosts) > self.max_hosts:
+                self.hosts.popitem(last=False)
+        if self.on_load is not None:
+            self.on_load(parsed.netloc, rules)
+        return rules
+
+
+def iter_sitemap(content):
+    ''' Yield ("url", loc) and ("sitemap", loc) entries of a sitemap or
+    sitemap index, gzipped or not, without building the whole tree. '''
+    # BytesIO shares the bytes instead of copying them.
+    stream = io.BytesIO(content)
+    if content[:2] == b"\x1F\x8B":
+        stream = gzip.GzipFile(fileobj=stream)
+    kind = "url"
+    root = None
+    try:
+        for event, element in iterparse(stream, events=("start", "end")):
+            tag = element.tag.rsplit("}", 1)[-1]
+            if event == "start":
+                if root is None:
+                    root = element
+                if tag == "sitemapindex":
+                    kind = "sitemap"
+                continue
+            if tag == "loc" and element.text:
+                yield kind, element.text.strip()
+            elif tag in ("url", "sitemap"):
+                # Drop the entries read so far from the tree.
+                root.clear()
+    except (ParseError, OSError, EOFError):
+        return
+
+
+def sitemap_urls(fetch, sitemaps, limit=50000, max_sitemaps=100):
+    ''' Urls listed in the sitemaps, following sitemap indexes. '''
+    pending = list(sitemaps)
+    fetched = set()
+    count = 0
+    while pending and len(fetched) < max_sitemaps:
+        sitemap = pending.pop()
+        if sitemap in fetched:
+            continue
+        fetched.add(sitemap)
+        resp = fetch(sitemap)
+        if resp.status != 200 or resp.raw_response is None:
+            continue
+        for kind, loc in iter_sitemap(resp.raw_response.content):
+            if kind == "sitemap":
+                pending.append(urljoin(sitemap, loc))
+                continue
+            yield loc
+            count += 1
+            if count >= limit:
+                return
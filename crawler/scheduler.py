@@ -0,0 +1,161 @@
+import time
+import heapq
+from itertools import count
+from threading import Condition
+
+
+class HostScheduler(object):
+    ''' Per-host politeness scheduler with prioritized urls.
+
+    Every host has its own heap of pending (score, item) entries, lowest
+    score first. Hosts that have pending urls and are not currently being
+    fetched wait in a min-heap keyed by the time they are next allowed to be
+    fetched; once that time has passed they move to a heap keyed by the score
+    of their best url, and get() takes the best host from it. A worker thus
+    only waits until *some* host is ready instead of sleeping after every
+    download. A host is taken out while one of its urls is in flight and
+    becomes ready again `delay` seconds after `release` is called, so a host is
+    never fetched by two workers at once. `acquire` takes a host the same way
+    for downloads outside of get(), such as its sitemaps. All operations are
+    O(log n).
+    '''
+    def __init__(self, delay):
+        self.delay = delay
+        self.cond = Condition()
+        self.queues = dict()
+        self.waiting = list()
+        self.ready = list()
+        self.scheduled = set()
+        self.next_allowed = dict()
+        # Longer delays of hosts that ask for one with Crawl-delay.
+        self.host_delays = dict()
+        self.order = count()
+        self.in_flight = 0
+        # Threads still adding urls, e.g. while the save file is loaded.
+        self.producers = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add_producer(self):
+        with self.cond:
+            self.producers += 1
+
+    def remove_producer(self):
+        with self.cond:
+            self.producers -= 1
+            self.cond.notify_all()
+
+    def set_delay(self, netloc, delay):
+        with self.cond:
+            if delay > self.delay:
+                self.host_delays[netloc] = delay
+            else:
+                self.host_delays.pop(netloc, None)
+
+    def host_sizes(self):
+        with self.cond:
+            return {netloc: len(queue) for netloc, queue in self.queues.items()}
+
+    def idle(self):
+        ''' True when nothing is queued, in flight or being added. '''
+        with self.cond:
+            return not self.size and not self.in_flight and not self.producers
+
+    def add(self, netloc, item, score=0):
+        self.add_many([(netloc, item, score)])
+
+    def add_many(self, entries):
+        ''' Add (netloc, item, score) entries under a single lock. '''
+        if not entries:
+            return
+        with self.cond:
+            for netloc, item, score in entries:
+                queue = self.queues.get(netloc)
+                if queue is None:
+                    queue = self.queues[netloc] = list()
+                heapq.heappush(queue, (score, next(self.order), item))
+                self.size += 1
+                if netloc not in self.scheduled and not self._busy(netloc):
+                    self._schedule(netloc, self.next_allowed.get(netloc, 0))
+                    self.cond.notify()
+
+    def get(self):
+        ''' Block until a host is ready and return (netloc, item) for it.
+        Returns None once there is nothing queued, nothing in flight and no
+        producer is adding urls. '''
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                while self.waiting and self.waiting[0][0] <= now:
+                    _, netloc = heapq.heappop(self.waiting)
+                    if self._deferred(netloc, now):
+                        continue
+                    heapq.heappush(self.ready, (self.queues[netloc][0][0], netloc))
+
+                if self.ready:
+                    _, netloc = heapq.heappop(self.ready)
+                    if self._deferred(netloc, now):
+                        continue
+                    self.scheduled.discard(netloc)
+                    queue = self.queues[netloc]
+                    _, _, item = heapq.heappop(queue)
+                    if not queue:
+                        del self.queues[netloc]
+                    self.size -= 1
+                    self.in_flight += 1
+                    self.next_allowed[netloc] = None
+                    return netloc, item
+                elif self.waiting:
+                    self.cond.wait(self.waiting[0][0] - now)
+                elif self.in_flight or self.producers:
+                    # Urls being fetched may still produce new links.
+                    self.cond.wait()
+                else:
+                    return None
+
+    def acquire(self, netloc):
+        ''' Block until netloc may be fetched and take it as get() does, for a
+        download that is not a queued url. Give it back with `release`. '''
+        with self.cond:
+            while True:
+                ready_at = self.next_allowed.get(netloc, 0)
+                now = time.monotonic()
+                if ready_at is None:
+                    self.cond.wait()
+                elif ready_at > now:
+                    self.cond.wait(ready_at - now)
+                else:
+                    break
+            self.in_flight += 1
+            self.next_allowed[netloc] = None
+
+    def release(self, netloc):
+        ''' Mark the in-flight url of netloc as done and start its delay. '''
+        with self.cond:
+            self.in_flight -= 1
+            ready_at = time.monotonic() + self.host_delays.get(netloc, self.delay)
+            self.next_allowed[netloc] = ready_at
+            if netloc in self.queues and netloc not in self.scheduled:
+                self._schedule(netloc, ready_at)
+            self.cond.notify_all()
+
+    def _busy(self, netloc):
+        return netloc in self.next_allowed and self.next_allowed[netloc] is None
+
+    def _deferred(self, netloc, now):
+        # A host taken by acquire while it was scheduled is dropped here and
+        # scheduled again by release; one whose delay was restarted waits.
+        ready_at = self.next_allowed.get(netloc, 0)
+        if ready_at is None:
+            self.scheduled.discard(netloc)
+            return True
+        if ready_at > now:
+            heapq.heappush(self.waiting, (ready_at, netloc))
+            return True
+        return False
+
+    def _schedule(self, netloc, ready_at):
+        heapq.heappush(self.waiting, (ready_at, netloc))
+        self.scheduled.add(netloc)
@@ -0,0 +1,42 @@
+from math import log2
+
+
+# A scoring function takes the parsed url, its depth from the seed urls and
+# the frontier's TrapDetector (for its host and template counts), and returns
+# a number; urls with lower scores are downloaded first.
+
+def depth_score(parsed, depth, traps):
+    # Breadth first: shallow pages of every host come first.
+    return depth
+
+
+def host_score(parsed, depth, traps):
+    # Hosts with many urls already wait longer for each new one.
+    return log2(1 + traps.host_counts[parsed.netloc])
+
+
+def novelty_score(parsed, depth, traps):
+    # Urls shaped like many seen before (same path template) come last.
+    return log2(1 + traps.template_counts[traps.template(parsed)])
+
+
+SCORERS = {
+    "depth": depth_score,
+    "host": host_score,
+    "novelty": novelty_score,
+}
+
+
+def make_scorer(spec):
+    ''' Weighted sum of scoring functions from a spec like "depth:1,novelty:0.5".
+    Functions can be added to SCORERS; an empty spec scores every url 0 (FIFO). '''
+    weighted = []
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition(":")
+        weighted.append((SCORERS[name.strip()], float(weight) if weight.strip() else 1.0))
+
+    def score(parsed, depth, traps):
+        return sum(weight * scorer(parsed, depth, traps) for scorer, weight in weighted)
+    return score
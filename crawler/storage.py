@@ -0,0 +1,305 @@
+import os
+import shelve
+import sqlite3
+from urllib.parse import urlparse
+from threading import Thread, Lock, Event
+
+from utils.metrics import STORAGE_SYNC_SECONDS
+
+
+class FrontierStorage(object):
+    ''' Interface of the storage behind the frontier save file.
+
+    Every url is stored under its urlhash as a (url, completed, score, depth)
+    record: score is its priority in the frontier and depth its distance from
+    the seed urls.
+    Implementations are not thread safe; WriteBehindSave serializes access.
+    '''
+    @classmethod
+    def exists(cls, path):
+        raise NotImplementedError
+
+    def __contains__(self, urlhash):
+        raise NotImplementedError
+
+    def __getitem__(self, urlhash):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def empty(self):
+        ''' True if no url is stored, without counting them. '''
+        raise NotImplementedError
+
+    def write_batch(self, records):
+        ''' Persist an ordered list of (urlhash, record) pairs. '''
+        raise NotImplementedError
+
+    def pending_urls(self):
+        ''' Iterate over (url, score, depth) of the urls not completed yet. '''
+        raise NotImplementedError
+
+    def urls(self):
+        ''' Iterate over all urls. '''
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+
+class ShelveStorage(FrontierStorage):
+    ''' The original save file: a shelve of pickled record tuples.
+    Save files from before scores were added hold (url, completed) pairs. '''
+    @classmethod
+    def exists(cls, path):
+        return any(os.path.exists(path + ext) for ext in ("", ".dat", ".db"))
+
+    def __init__(self, path, flag="c"):
+        self.save = shelve.open(path, flag=flag)
+
+    def __contains__(self, urlhash):
+        return urlhash in self.save
+
+    def __getitem__(self, urlhash):
+        return self._record(self.save[urlhash])
+
+    def __len__(self):
+        return len(self.save)
+
+    def empty(self):
+        # dbm.gnu can read its first key alone; the other dbm modules count
+        # their keys anyway.
+        firstkey = getattr(self.save.dict, "firstkey", None)
+        if firstkey is not None:
+            return firstkey() is None
+        return not len(self.save)
+
+    def write_batch(self, records):
+        for urlhash, record in records:
+            self.save[urlhash] = record
+        self.save.sync()
+
+    def pending_urls(self):
+        for record in self.save.values():
+            url, completed, score, depth = self._record(record)
+            if not completed:
+                yield url, score, depth
+
+    def urls(self):
+        for record in self.save.values():
+            yield record[0]
+
+    def close(self):
+        self.save.close()
+
+    @staticmethod
+    def _record(record):
+        if len(record) == 2:
+            return record + (0, 0)
+        return record
+
+
+class SQLiteStorage(FrontierStorage):
+    ''' Save file in an SQLite database in WAL mode.
+
+    The urls table is indexed by hash and completion flag, so resuming only
+    reads the pending urls.
+    '''
+    CHUNK_SIZE = 10000
+
+    @classmethod
+    def exists(cls, path):
+        return os.path.exists(path + ".sqlite")
+
+    def __init__(self, path, flag="c"):
+        path = path + ".sqlite"
+        if flag == "n":
+            for ext in ("", "-wal", "-shm"):
+                if os.path.exists(path + ext):
+                    os.remove(path + ext)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            "hash TEXT PRIMARY KEY, url TEXT NOT NULL, host TEXT NOT NULL, "
+            "completed INTEGER NOT NULL DEFAULT 0, "
+            "score REAL NOT NULL DEFAULT 0, depth INTEGER NOT NULL DEFAULT 0)")
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(urls)")}
+        for column, definition in (
+                ("score", "REAL NOT NULL DEFAULT 0"),
+                ("depth", "INTEGER NOT NULL DEFAULT 0")):
+            if column not in columns:
+                self.db.execute(f"ALTER TABLE urls ADD COLUMN {column} {definition}")
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS urls_completed ON urls (completed)")
+        self.db.commit()
+
+    def __contains__(self, urlhash):
+        return self.db.execute(
+            "SELECT 1 FROM urls WHERE hash = ?", (urlhash,)).fetchone() is not None
+
+    def __getitem__(self, urlhash):
+        row = self.db.execute(
+            "SELECT url, completed, score, depth FROM urls WHERE hash = ?",
+            (urlhash,)).fetchone()
+        if row is None:
+            raise KeyError(urlhash)
+        return row[0], bool(row[1]), row[2], row[3]
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+
+    def empty(self):
+        return self.db.execute("SELECT 1 FROM urls LIMIT 1").fetchone() is None
+
+    def write_batch(self, records):
+        self.db.executemany(
+            "INSERT INTO urls (hash, url, host, completed, score, depth) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (hash) DO UPDATE SET completed = excluded.completed",
+            [(urlhash, url, urlparse(url).netloc.lower(), int(completed), score, depth)
+             for urlhash, (url, completed, score, depth) in records])
+        self.db.commit()
+
+    def pending_urls(self):
+        # Page through the completion index so no cursor stays open.
+        for _, url, score, depth in self._paged(
+                "url, score, depth", "completed = 0 AND rowid > ?"):
+            yield url, score, depth
+
+    def urls(self):
+        for _, url in self._paged("url", "rowid > ?"):
+            yield url
+
+    def _paged(self, columns, condition):
+        # Only the rows that existed when the iteration started, not the urls
+        # added while it runs.
+        end = self.db.execute("SELECT MAX(rowid) FROM urls").fetchone()[0] or 0
+        last = 0
+        while True:
+            rows = self.db.execute(
+                f"SELECT rowid, {columns} FROM urls WHERE {condition} AND rowid <= ? "
+                "ORDER BY rowid LIMIT ?", (last, end, self.CHUNK_SIZE)).fetchall()
+            if not rows:
+                return
+            yield from rows
+            last = rows[-1][0]
+
+    def close(self):
+        self.db.close()
+
+
+STORAGE_BACKENDS = {
+    "shelve": ShelveStorage,
+    "sqlite": SQLiteStorage,
+}
+
+
+class WriteBehindSave(object):
+    ''' Buffers writes to the frontier save in memory and flushes them in batches.
+
+    A batch is written once `batch_size` mutations are pending or `interval`
+    seconds have passed, by a background thread, with a single commit.
+    Mutations are written in the order they were made (a rewritten key moves to
+    the end), so a url is only ever persisted as completed after the links found
+    on it. A crash therefore loses at most the last unflushed batch, and resuming
+    re-crawls the pages whose completion was in it. `before_write` is called
+    before every batch is written, e.g. to flush files that must stay at least
+    as far along as the save.
+    '''
+    def __init__(self, save, batch_size=500, interval=5.0, before_write=None):
+        self.save = save
+        self.batch_size = batch_size
+        self.interval = interval
+        self.before_write = before_write
+        self.pending = dict()
+        self.flushing = dict()
+        self.lock = Lock()
+        self.io_lock = Lock()
+        self.wakeup = Event()
+        self.closed = False
+        self.thread = Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def __contains__(self, key):
+        with self.lock:
+            if key in self.pending or key in self.flushing:
+                return True
+        with self.io_lock:
+            return key in self.save
+
+    def __getitem__(self, key):
+        with self.lock:
+            if key in self.pending:
+                return self.pending[key]
+            if key in self.flushing:
+                return self.flushing[key]
+        with self.io_lock:
+            return self.save[key]
+
+    def __setitem__(self, key, value):
+        self.update([(key, value)])
+
+    def update(self, items):
+        with self.lock:
+            for key, value in items:
+                self.pending.pop(key, None)
+                self.pending[key] = value
+            if len(self.pending) >= self.batch_size:
+                self.wakeup.set()
+
+    def __len__(self):
+        self.sync()
+        with self.io_lock:
+            return len(self.save)
+
+    def empty(self):
+        with self.lock:
+            if self.pending or self.flushing:
+                return False
+        with self.io_lock:
+            return self.save.empty()
+
+    def pending_urls(self):
+        return self._locked_iter(self.save.pending_urls)
+
+    def urls(self):
+        return self._locked_iter(self.save.urls)
+
+    def _locked_iter(self, method):
+        self.sync()
+        iterator = method()
+        while True:
+            with self.io_lock:
+                item = next(iterator, None)
+            if item is None:
+                return
+            yield item
+
+    def sync(self):
+        with self.io_lock:
+            with self.lock:
+                self.flushing, self.pending = self.pending, dict()
+            if self.flushing:
+                if self.before_write is not None:
+                    self.before_write()
+                with STORAGE_SYNC_SECONDS.time():
+                    self.save.write_batch(list(self.flushing.items()))
+            with self.lock:
+                self.flushing = dict()
+
+    def close(self):
+        self.closed = True
+        self.wakeup.set()
+        self.thread.join()
+        self.sync()
+        self.save.close()
+
+    def _run(self):
+        while not self.closed:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            if self.pending:
+                self.sync()
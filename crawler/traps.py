@@ -0,0 +1,113 @@
+import re
+import zlib
+from collections import Counter
+from threading import Lock
+from urllib.parse import urlparse
+
+_DATE_RE = re.compile(r"\d{4}[-/]\d{1,2}(?:[-/]\d{1,2})?")
+_DIGITS_RE = re.compile(r"\d+")
+
+
+def path_template(path):
+    # /events/2021-10-13/page/2 -> /events/<date>/page/<n>
+    return _DIGITS_RE.sub("<n>", _DATE_RE.sub("<date>", path))
+
+
+def _value_hash(value):
+    # Stable across runs, unlike hash(), so checkpointed values still match.
+    return zlib.crc32(value.encode("utf-8"))
+
+
+class TrapDetector(object):
+    ''' Budgets that stop the crawl from following generated urls.
+
+    A new url is dropped when its path is deeper than `max_depth` segments,
+    repeats one segment more than `max_repeats` times, when more than
+    `template_budget` urls share its host and path template (digits and dates
+    collapsed) and query parameter names, when a query parameter of its path
+    took more than `param_budget` different values, or when its host already
+    has `host_budget` urls (0 for no limit). Every budget that runs out is
+    logged once. The counts are checkpointed with the analytics, so a resumed
+    crawl does not give every trap a full budget again.
+    '''
+    def __init__(self, logger, max_depth=12, max_repeats=3, template_budget=1000,
+                 param_budget=200, host_budget=0):
+        self.logger = logger
+        self.max_depth = max_depth
+        self.max_repeats = max_repeats
+        self.template_budget = template_budget
+        self.param_budget = param_budget
+        self.host_budget = host_budget
+        self.lock = Lock()
+        self.template_counts = Counter()
+        self.host_counts = Counter()
+        self.param_values = dict()
+        self.tripped = set()
+
+    def check(self, url):
+        ''' Count a new url and return why it is a trap, or None. '''
+        parsed = urlparse(url)
+        host = parsed.netloc
+        segments = [segment for segment in parsed.path.split("/") if segment]
+
+        if len(segments) > self.max_depth:
+            return f"trap: path deeper than {self.max_depth}"
+        if segments:
+            segment, repeats = Counter(segments).most_common(1)[0]
+            if repeats > self.max_repeats:
+                return f"trap: segment {segment} repeated {repeats} times"
+
+        params = [param.partition("=") for param in parsed.query.split("&") if param]
+        template = self.template(parsed)
+
+        with self.lock:
+            self.host_counts[host] += 1
+            if self.host_budget and self.host_counts[host] > self.host_budget:
+                return self._trip(host, f"trap: more than {self.host_budget} urls on {host}")
+
+            self.template_counts[template] += 1
+            if self.template_counts[template] > self.template_budget:
+                return self._trip(
+                    template, f"trap: more than {self.template_budget} urls like {template}")
+
+            for name, _, value in params:
+                key = (host, parsed.path, name)
+                values = self.param_values.get(key)
+                if values is None:
+                    values = self.param_values[key] = set()
+                value_hash = _value_hash(value)
+                if len(values) < self.param_budget:
+                    values.add(value_hash)
+                elif value_hash not in values:
+                    return self._trip(
+                        key, f"trap: more than {self.param_budget} values of {name} on {host}{parsed.path}")
+        return None
+
+    def snapshot(self):
+        ''' The counts behind the budgets as a json-able dict. '''
+        with self.lock:
+            return {
+                "templates": dict(self.template_counts),
+                "hosts": dict(self.host_counts),
+                "params": [
+                    [host, path, name, sorted(values)]
+                    for (host, path, name), values in self.param_values.items()]}
+
+    def restore(self, state):
+        with self.lock:
+            self.template_counts = Counter(state["templates"])
+            self.host_counts = Counter(state["hosts"])
+            self.param_values = {
+                (host, path, name): set(values)
+                for host, path, name, values in state["params"]}
+
+    def template(self, parsed):
+        # Host, path template and query parameter names of a url.
+        names = sorted({param.partition("=")[0] for param in parsed.query.split("&") if param})
+        return f"{parsed.netloc}{path_template(parsed.path)}?{'&'.join(names)}"
+
+    def _trip(self, pattern, reason):
+        if pattern not in self.tripped:
+            self.tripped.add(pattern)
+            self.logger.warning(f"Dropping urls from now on, {reason}")
+        return reason
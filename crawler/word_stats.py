@@ -0,0 +1,161 @@
+import heapq
+from array import array
+from collections import Counter
+from threading import Lock, local
+
+
+class Vocabulary(object):
+    ''' Exact word counts: terms are interned to ids, counts live in an array. '''
+    def __init__(self):
+        self.ids = dict()
+        self.terms = list()
+        self.counts = array("Q")
+
+    def __len__(self):
+        return len(self.terms)
+
+    def restore(self, terms, counts):
+        # The term ids are only built when the first page is counted.
+        self.ids = None
+        self.terms = terms
+        self.counts = counts
+
+    def snapshot(self):
+        return list(self.terms), array("Q", self.counts)
+
+    def update(self, counter):
+        if self.ids is None:
+            self.ids = {term: i for i, term in enumerate(self.terms)}
+        ids = self.ids
+        counts = self.counts
+        for term, count in counter.items():
+            term_id = ids.get(term)
+            if term_id is None:
+                ids[term] = len(self.terms)
+                self.terms.append(term)
+                counts.append(count)
+            else:
+                counts[term_id] += count
+
+    def most_common(self, n):
+        top = heapq.nlargest(n, range(len(self.counts)), key=self.counts.__getitem__)
+        return [(self.terms[i], self.counts[i]) for i in top]
+
+
+class SpaceSaving(object):
+    ''' Approximate top-k word counts in a fixed number of counters.
+
+    When all k counters are taken, a new word replaces the smallest counter
+    and inherits its count (the Space-Saving algorithm), so every reported
+    count overestimates the true one by at most the smallest counter.
+    '''
+    def __init__(self, k):
+        self.k = k
+        self.counts = dict()
+        # Min-heap of (count, term); entries whose count changed are stale.
+        self.heap = list()
+
+    def __len__(self):
+        return len(self.counts)
+
+    def restore(self, terms, counts):
+        self.counts = dict(zip(terms, counts))
+        self.heap = [(count, term) for term, count in self.counts.items()]
+        heapq.heapify(self.heap)
+
+    def snapshot(self):
+        return list(self.counts), array("Q", self.counts.values())
+
+    def update(self, counter):
+        for term, count in counter.items():
+            self._add(term, count)
+        if len(self.heap) > 4 * self.k:
+            self.heap = [(count, term) for term, count in self.counts.items()]
+            heapq.heapify(self.heap)
+
+    def _add(self, term, count):
+        counts = self.counts
+        if term in counts:
+            counts[term] += count
+        elif len(counts) < self.k:
+            counts[term] = count
+        else:
+            while True:
+                smallest, evicted = heapq.heappop(self.heap)
+                if counts.get(evicted) == smallest:
+                    break
+            del counts[evicted]
+            counts[term] = smallest + count
+        heapq.heappush(self.heap, (counts[term], term))
+
+    def most_common(self, n):
+        return heapq.nlargest(n, self.counts.items(), key=lambda item: item[1])
+
+
+class _LocalCounts(object):
+    def __init__(self):
+        self.lock = Lock()
+        self.counter = Counter()
+        self.pages = 0
+
+
+class WordStats(object):
+    ''' Word frequencies of the whole crawl.
+
+    Each thread counts words into its own Counter, which is merged in place
+    into the shared totals every `merge_every` pages, so the shared lock is
+    taken once per batch of pages instead of once per page. The totals are an
+    exact Vocabulary, or a SpaceSaving summary of `top_k` counters if set.
+    '''
+    def __init__(self, top_k=0, merge_every=50):
+        self.totals = SpaceSaving(top_k) if top_k else Vocabulary()
+        self.merge_every = merge_every
+        self.lock = Lock()
+        self.local = local()
+        self.buffers = list()
+
+    def add(self, word_list):
+        buffer = self._buffer()
+        with buffer.lock:
+            buffer.counter.update(word_list)
+            buffer.pages += 1
+            full = buffer.pages >= self.merge_every
+        if full:
+            self._merge(buffer)
+
+    def most_common(self, n):
+        self._merge_all()
+        with self.lock:
+            return self.totals.most_common(n)
+
+    def snapshot(self):
+        ''' (terms, counts) of all words counted so far. '''
+        self._merge_all()
+        with self.lock:
+            return self.totals.snapshot()
+
+    def restore(self, terms, counts):
+        with self.lock:
+            self.totals.restore(terms, counts)
+
+    def _merge_all(self):
+        with self.lock:
+            buffers = list(self.buffers)
+        for buffer in buffers:
+            self._merge(buffer)
+
+    def _buffer(self):
+        buffer = getattr(self.local, "buffer", None)
+        if buffer is None:
+            buffer = self.local.buffer = _LocalCounts()
+            with self.lock:
+                self.buffers.append(buffer)
+        return buffer
+
+    def _merge(self, buffer):
+        with buffer.lock:
+            counter = buffer.counter
+            buffer.counter = Counter()
+            buffer.pages = 0
+        with self.lock:
+            self.totals.update(counter)
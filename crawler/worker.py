@@ -1,20 +1,74 @@
+import time
 from threading import Thread
 
 from inspect import getsource
+from functools import lru_cache
 from utils.download import download
 from utils import get_logger
+from utils.metrics import PAGES
 import scraper
-import time
 from crawler.frontier import Frontier
+from crawler.recrawl import get_validators
+
+
+@lru_cache(maxsize=None)
+def check_scraper_source():
+    # basic check for requests in scraper, done once per process.
+    source = getsource(scraper)
+    assert {source.find(req) for req in {"from requests import", "import requests"}} == {-1}, "Do not use requests in scraper.py"
+    assert {source.find(req) for req in {"from urllib.request import", "import urllib.request"}} == {-1}, "Do not use urllib.request in scraper.py"
+
+
+def fetch_info(status, validators, latency):
+    # Status, 64-bit content hash and download time of a page.
+    content_hash = int(validators["content_hash"][:16], 16) if validators else 0
+    return status, content_hash, latency
+
+
+def reject_page(frontier, url, resp, max_size, latency=0.0):
+    # Filter out a page that is not html or too large before it is decoded.
+    reason = resp.reject_reason(max_size)
+    if reason is None:
+        return False
+    with frontier.page_update():
+        frontier.record_page(url, fetch_info(resp.status, None, latency), 0)
+        frontier.add_filtered_url((url, reason))
+        frontier.mark_url_complete(url)
+    return True
+
+
+def merge_scraped(frontier, url, result, fetch=None, fingerprint=None):
+    # Add what scraper.scraper returned for url to the frontier. fingerprint
+    # is the SimHash of the words if it was computed already.
+    is_valid, scraped_urls, filtered_urls, word_list, text_hash = result
+    PAGES.inc()
+
+    with frontier.page_update():
+        if fetch is not None:
+            frontier.record_page(url, fetch, len(word_list))
+        if is_valid:
+            duplicate = frontier.check_duplicate(url, word_list, text_hash, fingerprint)
+            if duplicate:
+                # Neither the words nor the links of a duplicate page are used.
+                frontier.add_filtered_url((url, duplicate))
+                frontier.mark_url_complete(url)
+                return
+            frontier.record_url(url)
+
+        frontier.extract_info(url, word_list)
+        frontier.add_filtered_urls(filtered_urls)
+        frontier.record_links(url, scraped_urls)
+        frontier.add_urls(scraped_urls, frontier.url_depth(url) + 1)
+        # Politeness is enforced per host by the frontier from here on.
+        frontier.mark_url_complete(url)
+
 
 class Worker(Thread):
     def __init__(self, worker_id, config, frontier: Frontier):
         self.logger = get_logger(f"Worker-{worker_id}", f"Worker{worker_id}")
         self.config = config
         self.frontier = frontier
-        # basic check for requests in scraper
-        assert {getsource(scraper).find(req) for req in {"from requests import", "import requests"}} == {-1}, "Do not use requests in scraper.py"
-        assert {getsource(scraper).find(req) for req in {"from urllib.request import", "import urllib.request"}} == {-1}, "Do not use urllib.request in scraper.py"
+        check_scraper_source()
         super().__init__(daemon=True)
         
     def run(self):
@@ -23,27 +77,41 @@ class Worker(Thread):
             if not tbd_url:
                 self.logger.info("Frontier is empty. Stopping Crawler.")
                 break
+            try:
+                self.crawl(tbd_url)
+            except Exception:
+                self.logger.exception(f"Failed to crawl {tbd_url}.")
+            finally:
+                # The host stays busy until its url is completed or released.
+                self.frontier.release_url(tbd_url)
 
-            if not scraper.is_valid(tbd_url):
-                self.frontier.add_filtered_url((tbd_url, "filtered out by text matching (already inserted in the queue)"))
-                continue
-
-            resp = download(tbd_url, self.config, self.logger)
-            self.logger.info(
-                f"Downloaded {tbd_url}, status <{resp.status}>, "
-                f"using cache {self.config.cache_server}.")
-
-        
-            is_valid, scraped_urls, filtered_urls, word_list = scraper.scraper(tbd_url, resp, self.logger)
-
-            if is_valid:
-                self.frontier.record_url(tbd_url)
-
-            self.frontier.extract_info(tbd_url, word_list)
-            for filtered_url in filtered_urls:
-                self.frontier.add_filtered_url(filtered_url)
-            for scraped_url in scraped_urls:
-                self.frontier.add_url(scraped_url)
+    def crawl(self, tbd_url):
+        valid, reason = scraper.check_url(tbd_url)
+        if not valid:
+            self.frontier.add_filtered_url((tbd_url, f"{reason} (already inserted in the queue)"))
             self.frontier.mark_url_complete(tbd_url)
+            return
+        if self.frontier.defer_for_robots(tbd_url):
+            return
+        reason = self.frontier.robots_check(tbd_url)
+        if reason:
+            self.frontier.add_filtered_url((tbd_url, reason))
+            self.frontier.mark_url_complete(tbd_url)
+            return
+
+        start = time.perf_counter()
+        resp = download(tbd_url, self.config, self.logger)
+        latency = time.perf_counter() - start
+        self.logger.info(
+            f"Downloaded {tbd_url}, status <{resp.status}>, "
+            f"using cache {self.config.cache_server}.")
+        if reject_page(self.frontier, tbd_url, resp, self.config.max_body_size, latency):
+            return
 
-            time.sleep(self.config.time_delay)
+        validators = get_validators(resp) if self.frontier.hash_pages else None
+        fetch = fetch_info(resp.status, validators, latency)
+        result = self.frontier.cached_result(tbd_url, validators)
+        if result is None:
+            result = scraper.scraper(tbd_url, resp, self.logger, self.config.parser)
+            self.frontier.cache_result(tbd_url, validators, result)
+        merge_scraped(self.frontier, tbd_url, result, fetch)
@@ -1,22 +1,59 @@
 from configparser import ConfigParser
 from argparse import ArgumentParser
+from multiprocessing import Process
 
 from utils.server_registration import get_cache_server
 from utils.config import Config
+from utils import set_log_dir
 from crawler import Crawler
+from crawler.pipeline import PipelineCrawler
+from crawler.partition import PartitionedFrontier
 
 
-def main(config_file, restart):
+CRAWLER_MODES = {
+    "thread": Crawler,
+    "pipeline": PipelineCrawler,
+}
+
+
+def main(config_file, restart, mode="thread", nodes=None, node_id=None, cache_server=None):
     cparser = ConfigParser()
     cparser.read(config_file)
     config = Config(cparser)
     print("Config parsed")
+    if nodes is not None:
+        config.nodes = nodes
+    if config.nodes > 1 and node_id is None:
+        # Run every node in its own process on this machine.
+        processes = [
+            Process(target=main, args=(
+                config_file, restart, mode, config.nodes, i, cache_server))
+            for i in range(config.nodes)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        return
     # config.cache_server = get_cache_server(config, restart)
     host = "styx.ics.uci.edu"
     port = 9001
+    if cache_server:
+        # e.g. the stand-in server of the benchmarks.
+        host, _, port = cache_server.rpartition(":")
+        port = int(port)
     config.cache_server = (host, port)
     print("Cache server obtained")
-    crawler = Crawler(config, restart)
+    if config.nodes > 1:
+        config.node_id = node_id
+        config.save_file = f"{config.save_file}.node{node_id}"
+        config.log_dir = f"Logs/node{node_id}"
+        set_log_dir(config.log_dir)
+        if config.metrics_port:
+            config.metrics_port += node_id
+        crawler = CRAWLER_MODES[mode](
+            config, restart, frontier_factory=PartitionedFrontier)
+    else:
+        crawler = CRAWLER_MODES[mode](config, restart)
     crawler.start()
 
 
@@ -24,5 +61,11 @@ if __name__ == "__main__":
     parser = ArgumentParser()
     parser.add_argument("--restart", action="store_true", default=False)
     parser.add_argument("--config_file", type=str, default="config.ini")
+    parser.add_argument("--mode", choices=CRAWLER_MODES, default="thread")
+    parser.add_argument("--nodes", type=int, default=None)
+    parser.add_argument("--node_id", type=int, default=None)
+    parser.add_argument("--cache_server", type=str, default=None)
     args = parser.parse_args()
-    main(args.config_file, args.restart)
+    main(
+        args.config_file, args.restart, args.mode,
+        args.nodes, args.node_id, args.cache_server)
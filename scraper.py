@@ -1,49 +1,62 @@
 import re
+from hashlib import sha1
 from urllib.parse import urlparse, urljoin
-from bs4 import BeautifulSoup
-from utils.response import Response
-import posixpath
+from utils.response import Response, MAGIC_BYTES
 from utils import *
-import enchant
+from utils.parse import parse_html
+from utils.tokenizer import tokenize
+from utils.url_filter import UrlFilter
 
 
 # Extract enough information and return a list of URLs
-def scraper(url, resp, logger):
+def scraper(url, resp, logger, parser="bs4"):
     status_code = resp.status
     error_code = resp.error
 
     if status_code != 200:
         if status_code >= 600:
             logger.info(error_code)
-        return False, [], [(url, f"status code {status_code}")], []
+        return False, [], [(url, f"status code {status_code}")], [], None
 
     if resp.raw and "text/html" not in resp.raw.headers["content-type"]:
         content_type = resp.raw.headers["content-type"]
-        return False, [], [(url, f"not text/html but {content_type}")], []
-    elif resp.raw_response.content.startswith(b"%PDF"):
-        # PDF
-        return False, [], [(url, "pdf file")], []
-    elif resp.raw_response.content.startswith(b"\xFF\xD8\xFF\xE0"):
-        # JPG
-        return False, [], [(url, "jpg file")], []
+        return False, [], [(url, f"not text/html but {content_type}")], [], None
+    for magic, reason in MAGIC_BYTES:
+        # PDF, JPG and other files served as html.
+        if resp.raw_response.content.startswith(magic):
+            return False, [], [(url, reason)], [], None
     # elif not is_valid(resp.url):
     #    return []
     
-    # Return a list of URLs
-    links = extract_next_links(url, resp, logger)
+    # Parse the page once for both the links and the text.
+    # parser="bs4" gives the same result as extract_next_links and html2text.
+    links, text = parse_html(url, resp.raw_response.content, parser)
     links = unique(links)
     
-    next_links = [link for link in links if is_valid(link)]
-    filtered_links = [(link, "filtered by text matching") for link in links if not is_valid(link)]
+    next_links = []
+    filtered_links = []
+    for link in links:
+        valid, reason = check_url(link)
+        if valid:
+            next_links.append(link)
+        else:
+            filtered_links.append((link, reason))
 
     # Extract English word list
-    word_list = html2text(resp)
+    word_list = text2words(text)
     
-    return True, next_links, filtered_links, word_list
+    return True, next_links, filtered_links, word_list, text_hash(text)
+
+
+def text_hash(text):
+    # Hash of the lowercased text with runs of whitespace collapsed, used to
+    # find pages with exactly the same content.
+    return sha1(" ".join(text.lower().split()).encode("utf-8")).digest()
 
 
 def html2text(resp):
     # https://stackoverflow.com/questions/328356/extracting-text-from-html-file-using-python
+    from bs4 import BeautifulSoup
 
     soup = BeautifulSoup(resp.raw_response.content, 'html.parser')
     # kill all script and style elements
@@ -58,19 +71,11 @@ def html2text(resp):
     # drop blank lines
     text = '\n'.join(chunk for chunk in chunks if chunk)
 
-    d = enchant.Dict("en_US")
-    word_list = []
-    for word in text.split():
-        word = word.replace("\x00", "")
-        word = word.lower()
-
-        if word and d.check(word):
-            if word not in stop_words:
-                word_list.append(word)
-
-    
+    return text2words(text)
 
-    return word_list
+def text2words(text):
+    # Lowercased English words that are not stop words.
+    return tokenize(text)
 
 def extract_next_links(url, resp: Response, logger):
     # Implementation required.
@@ -90,6 +95,7 @@ def extract_next_links(url, resp: Response, logger):
 
     link_list = []
 
+    from bs4 import BeautifulSoup
     soup = BeautifulSoup(resp.raw_response.content, 'html.parser')
     for link in soup.find_all("a"):
         href = link.get('href')
@@ -118,93 +124,42 @@ def extract_next_links(url, resp: Response, logger):
     return link_list
 
 
-def is_valid(url):
-    # Decide whether to crawl this url or not. 
-    # If you decide to crawl it, return True; otherwise return False.
-    # There are already some conditions that return False.
-    try:
-        parsed = urlparse(url)
-        if parsed.scheme not in set(["http", "https"]):
-            return False
-        if not check_file_url1(parsed) or not check_file_url2(parsed) or not check_file_url3(parsed):
-            return False
-        if not check_domain_path(parsed):
-            return False
-        if not check_calendar(parsed):
-            return False
-        if not check_less_information(parsed):
-            return False
-        if not check_less_info_blog(parsed):
-            return False
-        return True
-
-    except TypeError:
-        print ("TypeError for ", parsed)
-        raise
-
-
-def check_domain_path(parsed):
-    allowed_domains = ["ics.uci.edu", "cs.uci.edu", "informatics.uci.edu", "stat.uci.edu"]
-
-    netloc = parsed.netloc.lower()
-    if not netloc:
-        return False
-    path = parsed.path
-
-    if any((netloc == d) or (netloc.endswith(f".{d}")) for d in allowed_domains):
-        return True
-
-    if netloc == "today.uci.edu":
-        if path.startswith("/department/information_computer_sciences/"):
-            return True
-    
-    return False
-
-def check_file_url1(parsed):
-    return not re.match(
-            r".*\.(css|js|bmp|gif|jpe?g|ico"
-            + r"|png|tiff?|mid|mp2|mp3|mp4"
-            + r"|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
-            + r"|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names"
-            + r"|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso"
-            + r"|epub|dll|cnf|tgz|sha1"
-            + r"|thmx|mso|arff|rtf|jar|csv"
-            + r"|rm|smil|wmv|swf|wma|zip|rar|gz)$", parsed.path.lower())
-
-def check_file_url2(parsed):
-    deny_extensions = {'.' + e for e in IGNORED_EXTENSIONS}
-    return not posixpath.splitext(parsed.path)[1].lower() in deny_extensions
-
-def check_file_url3(parsed):
-    url = parsed.geturl()
-    return not any(url.endswith(f".{extension}") for extension in IGNORED_EXTENSIONS)
-
-def check_calendar(parsed):
+# Rules for urls to crawl. They are compiled once by UrlFilter.
+ALLOWED_DOMAINS = ["ics.uci.edu", "cs.uci.edu", "informatics.uci.edu", "stat.uci.edu"]
+ALLOWED_PATHS = {"today.uci.edu": "/department/information_computer_sciences/"}
+DENIED_EXTENSIONS = [
+    "css", "js", "bmp", "gif", "jpg", "jpeg", "ico",
+    "png", "tif", "tiff", "mid", "mp2", "mp3", "mp4",
+    "wav", "avi", "mov", "mpeg", "ram", "m4v", "mkv", "ogg", "ogv", "pdf",
+    "ps", "eps", "tex", "ppt", "pptx", "doc", "docx", "xls", "xlsx", "names",
+    "data", "dat", "exe", "bz2", "tar", "msi", "bin", "7z", "psd", "dmg", "iso",
+    "epub", "dll", "cnf", "tgz", "sha1",
+    "thmx", "mso", "arff", "rtf", "jar", "csv",
+    "rm", "smil", "wmv", "swf", "wma", "zip", "rar", "gz",
+]
+# Checked against the extension os.path.splitext finds in the path.
+NAME_EXTENSIONS = IGNORED_EXTENSIONS
+# Case sensitive, checked against the end of the whole url.
+URL_EXTENSIONS = IGNORED_EXTENSIONS
+TRAPS = [
     # "http://calendar.ics.uci.edu/calendar.php" 404
-    calendar_urls = "https://wics.ics.uci.edu/events/2021-10-13"
-    calendar_urls = urlparse(calendar_urls)
-
-    netloc = parsed.netloc.lower()
-    path = parsed.path.lower()
+    ("calendar", r"^https?://(?i:wics\.ics\.uci\.edu/events/)[^?#]*(?:200\d|201\d|202[01])"),
+    # e.g. http://sli.ics.uci.edu/Classes/Classes?action=login
+    ("login page", r"action=login"),
+    ("blog listing", r"^https://ngs\.ics\.uci\.edu/(?:author|category|tag)/"),
+]
 
-    if netloc == calendar_urls.netloc.lower():
-        if path.startswith("/events/"):
-            if any(str(year) in path for year in range(2000, 2022)):
-                return False
-    
-    return True
+url_filter = UrlFilter(
+    ALLOWED_DOMAINS, ALLOWED_PATHS, DENIED_EXTENSIONS, TRAPS,
+    URL_EXTENSIONS, NAME_EXTENSIONS)
 
-def check_less_information(parsed):
-    no_information_urls = ["http://sli.ics.uci.edu/Classes/Classes?action=login"]
-    if "action=login" in parsed.geturl():
-        return False
 
-    return True
+def check_url(url):
+    # Returns (True, None) if the url should be crawled, otherwise (False, reason).
+    return url_filter.check(url)
 
-def check_less_info_blog(parsed):
-    domains = ["https://ngs.ics.uci.edu/author/", "https://ngs.ics.uci.edu/category/", "https://ngs.ics.uci.edu/tag/"]
 
-    if any(parsed.geturl().startswith(domain) for domain in domains):
-        return False
-    
-    return True
\ No newline at end of file
+def is_valid(url):
+    # Decide whether to crawl this url or not. 
+    # If you decide to crawl it, return True; otherwise return False.
+    return url_filter.check(url)[0]
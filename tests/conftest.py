@@ -0,0 +1,7 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The crawler reads stop_words.txt and config.ini from the repo root.
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
@@ -0,0 +1,56 @@
+from configparser import ConfigParser
+
+import pytest
+
+from utils import set_log_dir
+from utils.config import Config
+from crawler.frontier import Frontier
+
+
+def make_config(tmp_path, storage):
+    cparser = ConfigParser()
+    cparser.read("config.ini")
+    config = Config(cparser)
+    config.save_file = str(tmp_path / "frontier")
+    config.log_dir = str(tmp_path / "Logs")
+    config.storage = storage
+    config.fast_start = True
+    config.time_delay = 0
+    config.robots = False
+    config.duplicate_distance = -1
+    config.page_cache = False
+    config.link_graph = False
+    config.trap_template_budget = 1 << 30
+    set_log_dir(config.log_dir)
+    return config
+
+
+class AddDuringLoad(Frontier):
+    ''' Calls add_urls from the loader thread, after it read its first batch. '''
+    added = None
+
+    def _load_pending(self, entries):
+        if self.added is not None:
+            added, self.added = self.added, None
+            self.add_urls(added)
+        return super()._load_pending(entries)
+
+
+@pytest.mark.parametrize("storage", ["shelve", "sqlite"])
+def test_add_urls_during_load_schedules_each_url_once(tmp_path, storage):
+    config = make_config(tmp_path, storage)
+    saved = [f"https://www.ics.uci.edu/page{i}" for i in range(3000)]
+    frontier = Frontier(config, True)
+    frontier.add_urls(saved)
+    pending = len(frontier.to_be_downloaded)
+    frontier.close()
+
+    new = [f"https://www.ics.uci.edu/new{i}" for i in range(500)]
+    AddDuringLoad.added = saved[-500:] + new
+    frontier = AddDuringLoad(config, False)
+    frontier.loader.join()
+    try:
+        assert frontier.added is None
+        assert len(frontier.to_be_downloaded) == pending + len(new)
+    finally:
+        frontier.close()
@@ -0,0 +1,72 @@
+import re
+import posixpath
+import itertools
+from urllib.parse import urlparse
+
+import scraper
+from utils import IGNORED_EXTENSIONS
+
+
+def baseline_is_valid(parsed):
+    # The checks scraper.is_valid made before the rules were compiled.
+    if parsed.scheme not in ("http", "https"):
+        return False
+    if re.match(
+            r".*\.(css|js|bmp|gif|jpe?g|ico"
+            + r"|png|tiff?|mid|mp2|mp3|mp4"
+            + r"|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
+            + r"|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names"
+            + r"|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso"
+            + r"|epub|dll|cnf|tgz|sha1"
+            + r"|thmx|mso|arff|rtf|jar|csv"
+            + r"|rm|smil|wmv|swf|wma|zip|rar|gz)$", parsed.path.lower()):
+        return False
+    if posixpath.splitext(parsed.path)[1].lower() in {"." + e for e in IGNORED_EXTENSIONS}:
+        return False
+    url = parsed.geturl()
+    if any(url.endswith(f".{extension}") for extension in IGNORED_EXTENSIONS):
+        return False
+
+    netloc = parsed.netloc.lower()
+    if not netloc:
+        return False
+    domains = ["ics.uci.edu", "cs.uci.edu", "informatics.uci.edu", "stat.uci.edu"]
+    if not any(netloc == d or netloc.endswith(f".{d}") for d in domains):
+        if netloc != "today.uci.edu" or not parsed.path.startswith(
+                "/department/information_computer_sciences/"):
+            return False
+
+    path = parsed.path.lower()
+    if netloc == "wics.ics.uci.edu" and path.startswith("/events/"):
+        if any(str(year) in path for year in range(2000, 2022)):
+            return False
+    if "action=login" in url:
+        return False
+    blogs = ["https://ngs.ics.uci.edu/author/", "https://ngs.ics.uci.edu/category/",
+             "https://ngs.ics.uci.edu/tag/"]
+    return not any(url.startswith(blog) for blog in blogs)
+
+
+SCHEMES = ["http", "https", "HTTPS", "ftp"]
+HOSTS = [
+    "www.ics.uci.edu", "NGS.ics.uci.edu", "ngs.ics.uci.edu", "wics.ics.uci.edu",
+    "WICS.ICS.UCI.EDU", "wics.ics.uci.edu:443", "today.uci.edu", "evil.com",
+    "www.stat.uci.edu", "sli.ics.uci.edu", "notics.uci.edu"]
+PATHS = [
+    "", "/", "/tag/x", "/author/", "/events/2015-3", "/EVENTS/2020", "/events/1999",
+    "/department/information_computer_sciences/a", "/department/other",
+    "/a.PDF", "/a.pdf", "/b.tar.gz", "/c.Tex", "/d.tex", "/e.rss", "/f.bib",
+    "/g.html", "/h.svg", "/i.data", "/.svg", "/.7zip", "/x/..pdf", "/a.b/.rss",
+    "/.a.svg", "/x.", "/dir.svg/", "/.pdf"]
+QUERIES = [
+    "", "?action=login", "?ACTION=LOGIN", "?x=a.pdf", "?x=a.PDF", "?f=b.tex",
+    "?d=c.data", "?q=a.zip", "?y=z.BIB", "?a=1", "#a.svg"]
+
+
+def test_compiled_rules_match_baseline():
+    differ = []
+    for parts in itertools.product(SCHEMES, HOSTS, PATHS, QUERIES):
+        url = "{}://{}{}{}".format(*parts)
+        if scraper.is_valid(url) != baseline_is_valid(urlparse(url)):
+            differ.append(url)
+    assert differ == []
@@ -1,28 +1,47 @@
 import os
 import logging
-from hashlib import sha256
+from hashlib import sha256, blake2b
 from urllib.parse import urlparse
 
-with open("stop_words.txt") as f:
-    stop_words = f.read().split()
+from utils.output import queue_logging
+
+_stop_words = None
+# Directory of the log files. Every node of a multi-node crawl has its own,
+# and the parser processes of the pipeline mode inherit it.
+_log_dir = os.environ.get("CRAWLER_LOG_DIR", "Logs")
+
+
+def get_stop_words():
+    # Read on first use instead of at import.
+    global _stop_words
+    if _stop_words is None:
+        with open("stop_words.txt") as f:
+            _stop_words = frozenset(f.read().split())
+    return _stop_words
+
+
+def __getattr__(name):
+    # utils.stop_words still works, loaded on first access.
+    if name == "stop_words":
+        return get_stop_words()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def set_log_dir(path):
+    global _log_dir
+    _log_dir = path
+    os.environ["CRAWLER_LOG_DIR"] = path
 
 
 def get_logger(name, filename=None):
     logger = logging.getLogger(name)
+    if logger.handlers:
+        return logger
     logger.setLevel(logging.INFO)
-    if not os.path.exists("Logs"):
-        os.makedirs("Logs")
-    fh = logging.FileHandler(f"Logs/{filename if filename else name}.log")
-    fh.setLevel(logging.DEBUG)
-    ch = logging.StreamHandler()
-    ch.setLevel(logging.INFO)
-    formatter = logging.Formatter(
-       "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-    fh.setFormatter(formatter)
-    ch.setFormatter(formatter)
-    # add the handlers to the logger
-    logger.addHandler(fh)
-    logger.addHandler(ch)
+    if not os.path.exists(_log_dir):
+        os.makedirs(_log_dir)
+    # The file and terminal are written by a background thread.
+    queue_logging(logger, f"{_log_dir}/{filename if filename else name}.log")
     return logger
 
 
@@ -33,6 +52,14 @@ def get_urlhash(url):
         f"{parsed.netloc}/{parsed.path}/{parsed.params}/"
         f"{parsed.query}/{parsed.fragment}".encode("utf-8")).hexdigest()
 
+def get_urlhash64(url):
+    # 64-bit hash of the same parts as get_urlhash, for in-memory sets.
+    parsed = urlparse(url)
+    return int.from_bytes(blake2b(
+        f"{parsed.netloc}/{parsed.path}/{parsed.params}/"
+        f"{parsed.query}/{parsed.fragment}".encode("utf-8"),
+        digest_size=8).digest(), "big")
+
 def normalize(url):
     if url.endswith("/"):
         return url.rstrip("/")
@@ -0,0 +1,142 @@
+import time
+import asyncio
+from urllib.parse import urlencode
+
+import cbor
+
+from utils.response import Response, RawResponse
+from utils.recorder import record
+from utils.metrics import DOWNLOAD_SECONDS, DOWNLOADS, DOWNLOAD_ERRORS
+
+
+class AsyncDownloader(object):
+    ''' Asyncio client for the cache server with pooled keep-alive connections.
+
+    At most `max_connections` requests are in flight at a time, each on its own
+    HTTP/1.1 connection that is returned to the pool when the response was read
+    completely. Requests that fail on the network or time out are retried
+    `retries` times on a fresh connection; if all attempts fail the Response has
+    status 600 and the reason in its error.
+    '''
+    def __init__(self, config, logger=None):
+        self.config = config
+        self.host, self.port = config.cache_server
+        self.user_agent = config.user_agent
+        self.timeout = config.download_timeout
+        self.retries = config.download_retries
+        self.logger = logger
+        self.idle = list()
+        self.slots = asyncio.Semaphore(config.max_connections)
+
+    async def download(self, url):
+        start = time.perf_counter()
+        resp = await self._download(url)
+        DOWNLOAD_SECONDS.observe(time.perf_counter() - start)
+        DOWNLOADS.inc()
+        if resp.status != 200:
+            DOWNLOAD_ERRORS.inc()
+        return resp
+
+    async def _download(self, url):
+        async with self.slots:
+            for attempt in range(self.retries + 1):
+                try:
+                    # A pooled connection may have been closed by the server
+                    # while it was idle, so retries always connect anew.
+                    resp = await asyncio.wait_for(
+                        self._get(url, fresh=attempt > 0), self.timeout)
+                    break
+                except (OSError, EOFError, ValueError, asyncio.TimeoutError) as e:
+                    error = f"{type(e).__name__} {e}"
+                    # The other idle connections are likely stale as well.
+                    while self.idle:
+                        self.idle.pop()[1].close()
+                    if self.logger:
+                        self.logger.warning(
+                            f"Attempt {attempt + 1} to download {url} failed: {error}")
+            else:
+                return Response({
+                    "error": f"Spacetime connection error {error} with url {url}.",
+                    "status": 600,
+                    "url": url}, raw=None)
+        if self.config.record_dir:
+            # Writing the file must not block the event loop.
+            await asyncio.get_running_loop().run_in_executor(
+                None, record, self.config, url, resp)
+        try:
+            if resp and resp.content:
+                return Response(cbor.loads(resp.content), raw=resp)
+        except (EOFError, ValueError) as e:
+            pass
+        if self.logger:
+            self.logger.error(f"Spacetime Response error {resp} with url {url}.")
+        return Response({
+            "error": f"Spacetime Response error {resp} with url {url}.",
+            "status": resp.status_code,
+            "url": url}, raw=None)
+
+    async def close(self):
+        while self.idle:
+            _, writer = self.idle.pop()
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def _get(self, url, fresh=False):
+        if self.idle and not fresh:
+            reader, writer = self.idle.pop()
+        else:
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            query = urlencode([("q", url), ("u", self.user_agent)])
+            writer.write(
+                f"GET /?{query} HTTP/1.1\r\n"
+                f"Host: {self.host}:{self.port}\r\n"
+                "Accept-Encoding: identity\r\n"
+                "Connection: keep-alive\r\n\r\n".encode("latin-1"))
+            await writer.drain()
+            resp, keep_alive = await self._read_response(reader)
+        except BaseException:
+            writer.close()
+            raise
+        if keep_alive:
+            self.idle.append((reader, writer))
+        else:
+            writer.close()
+        return resp
+
+    async def _read_response(self, reader):
+        status_line = await reader.readline()
+        if not status_line:
+            # The server closed an idle connection.
+            raise EOFError("connection closed")
+        version, status, _ = status_line.decode("latin-1").split(" ", 2)
+        headers = dict()
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = (
+            version == "HTTP/1.1"
+            and headers.get("connection", "").lower() != "close")
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            content = b"".join(chunks)
+        elif "content-length" in headers:
+            content = await reader.readexactly(int(headers["content-length"]))
+        else:
+            content = await reader.read()
+            keep_alive = False
+        return RawResponse(int(status), headers, content), keep_alive
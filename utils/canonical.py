@@ -0,0 +1,73 @@
+import re
+from urllib.parse import urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+# Query parameters that only track sessions or campaigns.
+STRIP_PARAMS = frozenset([
+    "utm_source", "utm_medium", "utm_campaign", "utm_term", "utm_content",
+    "sid", "sessionid", "session_id", "phpsessid", "jsessionid",
+    "share", "replytocom",
+])
+
+INDEX_PAGES = ("/index.html", "/index.htm")
+
+_PERCENT_RE = re.compile(r"%([0-9A-Fa-f]{2})")
+_HOST_PORT_RE = re.compile(r"^(.*?)(?::(\d*))?$")
+_UNRESERVED = frozenset(
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~")
+
+
+def _normalize_percent(match):
+    # Decode escaped unreserved characters, uppercase the other escapes.
+    char = chr(int(match.group(1), 16))
+    return char if char in _UNRESERVED else "%" + match.group(1).upper()
+
+
+def remove_dot_segments(path):
+    # RFC 3986 section 5.2.4.
+    output = []
+    for segment in path.split("/"):
+        if segment == ".":
+            continue
+        if segment == "..":
+            if len(output) > 1:
+                output.pop()
+            continue
+        output.append(segment)
+    if path.endswith(("/.", "/..")):
+        output.append("")
+    return "/".join(output)
+
+
+def canonicalize(url, strip_params=STRIP_PARAMS):
+    ''' Canonical form of url, so equivalent urls hash to the same value.
+
+    Lowercases the scheme and host, drops default ports, normalizes percent
+    escapes, removes dot segments, index pages and trailing slashes, sorts
+    the query without the parameters in strip_params, and drops the fragment.
+    '''
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+
+    userinfo, at, host_port = parts.netloc.rpartition("@")
+    host, port = _HOST_PORT_RE.match(host_port).groups()
+    netloc = userinfo + at + host.lower().rstrip(".")
+    if port and port != DEFAULT_PORTS.get(scheme):
+        netloc += ":" + port
+
+    path = remove_dot_segments(_PERCENT_RE.sub(_normalize_percent, parts.path))
+    if path.endswith(INDEX_PAGES):
+        path = path.rsplit("/", 1)[0]
+    path = path.rstrip("/")
+
+    params = []
+    for param in parts.query.split("&"):
+        if not param:
+            continue
+        if param.split("=", 1)[0].lower() in strip_params:
+            continue
+        params.append(_PERCENT_RE.sub(_normalize_percent, param))
+    query = "&".join(sorted(params))
+
+    return urlunsplit((scheme, netloc, path, query, ""))
@@ -1,5 +1,7 @@
 import re
 
+from utils.canonical import STRIP_PARAMS
+
 
 class Config(object):
     def __init__(self, config):
@@ -7,12 +9,56 @@ class Config(object):
         assert self.user_agent != "DEFAULT AGENT", "Set useragent in config.ini"
         assert re.match(r"^[a-zA-Z0-9_ ,]+$", self.user_agent), "User agent should not have any special characters outside '_', ',' and 'space'"
         self.threads_count = int(config["LOCAL PROPERTIES"]["THREADCOUNT"])
+        self.fetcher = config["LOCAL PROPERTIES"].get("FETCHER", "thread").strip()
+        self.process_count = config["LOCAL PROPERTIES"].getint("PROCESSCOUNT", 0)
         self.save_file = config["LOCAL PROPERTIES"]["SAVE"]
+        self.storage = config["LOCAL PROPERTIES"].get("STORAGE", "shelve").strip()
+        self.page_cache = config["LOCAL PROPERTIES"].getboolean("PAGECACHE", False)
+        self.save_batch = config["LOCAL PROPERTIES"].getint("SAVEBATCH", 500)
+        self.save_interval = config["LOCAL PROPERTIES"].getfloat("SAVEINTERVAL", 5.0)
+        self.fast_start = config["LOCAL PROPERTIES"].getboolean("FASTSTART", True)
+        self.frontier_shards = config["LOCAL PROPERTIES"].getint("FRONTIERSHARDS", 16)
+        self.checkpoint_interval = config["LOCAL PROPERTIES"].getfloat("CHECKPOINTINTERVAL", 300.0)
+        self.output_flush = config["LOCAL PROPERTIES"].getfloat("OUTPUTFLUSH", 1.0)
+        self.link_graph = config["LOCAL PROPERTIES"].getboolean("LINKGRAPH", True)
+        self.metrics_interval = config["LOCAL PROPERTIES"].getfloat("METRICSINTERVAL", 10.0)
+        self.metrics_port = config["LOCAL PROPERTIES"].getint("METRICSPORT", 0)
+        self.record_dir = config["LOCAL PROPERTIES"].get("RECORDDIR", "").strip()
+        self.nodes = config["LOCAL PROPERTIES"].getint("NODES", 1)
+        node_hosts = config["LOCAL PROPERTIES"].get("NODEHOST", "127.0.0.1")
+        self.node_hosts = [host.strip() for host in node_hosts.split(",")]
+        self.node_port = config["LOCAL PROPERTIES"].getint("NODEPORT", 9100)
+        self.node_idle = config["LOCAL PROPERTIES"].getfloat("NODEIDLE", 30.0)
+        self.node_id = 0
 
         self.host = config["CONNECTION"]["HOST"]
         self.port = int(config["CONNECTION"]["PORT"])
+        self.max_connections = config["CONNECTION"].getint("MAXCONNECTIONS", 8)
+        self.max_in_flight = config["CONNECTION"].getint("MAXINFLIGHT", 32)
+        self.download_timeout = config["CONNECTION"].getfloat("TIMEOUT", 30.0)
+        self.download_retries = config["CONNECTION"].getint("RETRIES", 2)
 
         self.seed_urls = config["CRAWLER"]["SEEDURL"].split(",")
         self.time_delay = float(config["CRAWLER"]["POLITENESS"])
+        self.top_words = config["CRAWLER"].getint("TOPWORDS", 0)
+        self.duplicate_distance = config["CRAWLER"].getint("DUPLICATEDISTANCE", 3)
+        strip_params = config["CRAWLER"].get("STRIPPARAMS", "")
+        self.strip_params = frozenset(
+            p.strip().lower() for p in strip_params.split(",") if p.strip()) or STRIP_PARAMS
+        self.trap_max_depth = config["CRAWLER"].getint("TRAPMAXDEPTH", 12)
+        self.trap_max_repeats = config["CRAWLER"].getint("TRAPMAXREPEATS", 3)
+        self.trap_template_budget = config["CRAWLER"].getint("TRAPTEMPLATEBUDGET", 1000)
+        self.trap_param_budget = config["CRAWLER"].getint("TRAPPARAMBUDGET", 200)
+        self.trap_host_budget = config["CRAWLER"].getint("TRAPHOSTBUDGET", 0)
+        self.scoring = config["CRAWLER"].get("SCORING", "depth:1,host:1,novelty:1")
+        self.parser = config["CRAWLER"].get("PARSER", "bs4").strip()
+        self.robots = config["CRAWLER"].getboolean("ROBOTS", True)
+        self.robots_ttl = config["CRAWLER"].getfloat("ROBOTSTTL", 86400.0)
+        self.robots_cache = config["CRAWLER"].getint("ROBOTSCACHE", 1024)
+        self.robots_max_delay = config["CRAWLER"].getfloat("ROBOTSMAXDELAY", 10.0)
+        self.sitemap_limit = config["CRAWLER"].getint("SITEMAPLIMIT", 50000)
+        self.max_body_size = config["CRAWLER"].getint("MAXBODYSIZE", 10 * 1024 * 1024)
 
-        self.cache_server = None
\ No newline at end of file
+        self.cache_server = None
+        # Directory of the crawl reports, one per node in multi-node mode.
+        self.log_dir = "Logs"
\ No newline at end of file
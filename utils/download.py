@@ -1,14 +1,32 @@
 import requests
 import cbor
 import time
+from threading import local
 
 from utils.response import Response
+from utils.recorder import record
+from utils.metrics import DOWNLOAD_SECONDS, DOWNLOADS, DOWNLOAD_ERRORS
+
+# One session per thread so connections to the cache server are kept alive.
+_sessions = local()
 
 def download(url, config, logger=None):
+    with DOWNLOAD_SECONDS.time():
+        resp = _download(url, config, logger)
+    DOWNLOADS.inc()
+    if resp.status != 200:
+        DOWNLOAD_ERRORS.inc()
+    return resp
+
+def _download(url, config, logger=None):
     host, port = config.cache_server
-    resp = requests.get(
+    if not hasattr(_sessions, "session"):
+        _sessions.session = requests.Session()
+    resp = _sessions.session.get(
         f"http://{host}:{port}/",
         params=[("q", f"{url}"), ("u", f"{config.user_agent}")])
+    if config.record_dir:
+        record(config, url, resp)
     try:
         if resp and resp.content:
             return Response(cbor.loads(resp.content), raw=resp)
@@ -0,0 +1,134 @@
+from array import array
+
+
+class HashSet64(object):
+    ''' Set of 64-bit hashes stored in a flat array with linear probing.
+
+    Takes 8 bytes per slot and grows at 2/3 load, so about 12-24 bytes per
+    hash instead of the hundreds a Python set of url strings needs. 0 marks an
+    empty slot, so the hash 0 is stored as 1.
+    '''
+    def __init__(self, capacity=1 << 16):
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self.table = array("Q", bytes(8 * size))
+        self.mask = size - 1
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, h):
+        h = h or 1
+        table = self.table
+        mask = self.mask
+        i = h & mask
+        while True:
+            slot = table[i]
+            if slot == h:
+                return True
+            if slot == 0:
+                return False
+            i = (i + 1) & mask
+
+    def add(self, h):
+        ''' Add h and return True if it was not in the set. '''
+        h = h or 1
+        table = self.table
+        mask = self.mask
+        i = h & mask
+        while True:
+            slot = table[i]
+            if slot == h:
+                return False
+            if slot == 0:
+                break
+            i = (i + 1) & mask
+        table[i] = h
+        self.size += 1
+        if 3 * self.size > 2 * len(table):
+            self._grow()
+        return True
+
+    def _grow(self):
+        old = self.table
+        self.table = array("Q", bytes(16 * len(old)))
+        self.mask = len(self.table) - 1
+        table = self.table
+        mask = self.mask
+        for h in old:
+            if h:
+                i = h & mask
+                while table[i]:
+                    i = (i + 1) & mask
+                table[i] = h
+
+
+class HashMap64(object):
+    ''' Map of 64-bit hashes to uint32 values in flat arrays, probed like
+    HashSet64.
+
+    Takes 12 bytes per slot, about 18-36 bytes per entry instead of the
+    ~100 of a dict of ints. The hash 0 is stored as 1 here too.
+    '''
+    def __init__(self, capacity=1 << 16):
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self.keys = array("Q", bytes(8 * size))
+        self.values = array("I", bytes(4 * size))
+        self.mask = size - 1
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def get(self, h, default=None):
+        h = h or 1
+        keys = self.keys
+        mask = self.mask
+        i = h & mask
+        while True:
+            slot = keys[i]
+            if slot == h:
+                return self.values[i]
+            if slot == 0:
+                return default
+            i = (i + 1) & mask
+
+    def __setitem__(self, h, value):
+        h = h or 1
+        keys = self.keys
+        mask = self.mask
+        i = h & mask
+        while True:
+            slot = keys[i]
+            if slot == h:
+                self.values[i] = value
+                return
+            if slot == 0:
+                break
+            i = (i + 1) & mask
+        keys[i] = h
+        self.values[i] = value
+        self.size += 1
+        if 3 * self.size > 2 * len(keys):
+            self._grow()
+
+    def _grow(self):
+        old_keys = self.keys
+        old_values = self.values
+        self.keys = array("Q", bytes(16 * len(old_keys)))
+        self.values = array("I", bytes(8 * len(old_keys)))
+        self.mask = len(self.keys) - 1
+        keys = self.keys
+        values = self.values
+        mask = self.mask
+        for h, value in zip(old_keys, old_values):
+            if h:
+                i = h & mask
+                while keys[i]:
+                    i = (i + 1) & mask
+                keys[i] = h
+                values[i] = value
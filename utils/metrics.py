@@ -0,0 +1,287 @@
+import os
+import json
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Thread, Lock, Event
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Upper bounds in seconds of the latency buckets.
+DEFAULT_BUCKETS = (
+    0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Counter(object):
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.lock = Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def drain(self):
+        with self.lock:
+            value, self.value = self.value, 0
+        return value
+
+    def merge(self, value):
+        self.inc(value)
+
+    def snapshot(self):
+        return self.value
+
+    def prometheus(self):
+        return [f"{self.name} {self.value}"]
+
+
+class Histogram(object):
+    ''' Count, sum and bucketed distribution of observed values. '''
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.lock = Lock()
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        i = bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def drain(self):
+        with self.lock:
+            state = (self.counts, self.count, self.sum)
+            self.counts = [0] * (len(self.buckets) + 1)
+            self.count = 0
+            self.sum = 0.0
+        return state
+
+    def merge(self, state):
+        counts, count, total = state
+        with self.lock:
+            self.counts = [a + b for a, b in zip(self.counts, counts)]
+            self.count += count
+            self.sum += total
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th value.
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if count and seen >= rank:
+                return bound
+        return 0.0
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "count": self.count, "sum": round(self.sum, 6),
+                "mean": round(self.sum / self.count, 6) if self.count else 0.0,
+                "p50": self.quantile(0.5), "p99": self.quantile(0.99)}
+
+    def prometheus(self):
+        with self.lock:
+            lines = []
+            seen = 0
+            for bound, count in zip(self.buckets, self.counts):
+                seen += count
+                lines.append(f'{self.name}_bucket{{le="{bound}"}} {seen}')
+            lines.append(f'{self.name}_bucket{{le="+Inf"}} {self.count}')
+            lines.append(f"{self.name}_sum {self.sum}")
+            lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+
+class Gauge(object):
+    ''' Value read from `read` when reported, a number or {label: number}. '''
+    def __init__(self, name, help, read, label="host"):
+        self.name = name
+        self.help = help
+        self.read = read
+        self.label = label
+
+    def snapshot(self):
+        return self.read()
+
+    def prometheus(self):
+        value = self.read()
+        if not isinstance(value, dict):
+            return [f"{self.name} {value}"]
+        return [f'{self.name}{{{self.label}="{key}"}} {count}' for key, count in value.items()]
+
+
+class TimedLock(object):
+    ''' Lock that records how long acquiring it waited in a histogram. '''
+    def __init__(self, histogram, lock=None):
+        self.histogram = histogram
+        self.lock = lock or Lock()
+
+    def acquire(self):
+        start = time.perf_counter()
+        self.lock.acquire()
+        self.histogram.observe(time.perf_counter() - start)
+        return True
+
+    def release(self):
+        self.lock.release()
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class Registry(object):
+    ''' The metrics of a process, registered once by name. '''
+    def __init__(self):
+        self.lock = Lock()
+        self.metrics = dict()
+
+    def counter(self, name, help=""):
+        return self._register(name, Counter, help)
+
+    def histogram(self, name, help="", buckets=DEFAULT_BUCKETS):
+        return self._register(name, Histogram, help, buckets)
+
+    def gauge(self, name, help, read, label="host"):
+        with self.lock:
+            self.metrics[name] = Gauge(name, help, read, label)
+            return self.metrics[name]
+
+    def _register(self, name, kind, *args):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = kind(name, *args)
+            return metric
+
+    def drain(self):
+        ''' Take the counters and histograms of this process, e.g. a parser
+        process, so they can be merged into the crawler's registry. '''
+        with self.lock:
+            metrics = [m for m in self.metrics.values() if not isinstance(m, Gauge)]
+        return {m.name: m.drain() for m in metrics}
+
+    def merge(self, drained):
+        for name, state in drained.items():
+            metric = self.metrics.get(name)
+            if metric is not None:
+                metric.merge(state)
+
+    def snapshot(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def prometheus(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            kind = type(metric).__name__.lower()
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {kind}")
+            lines.extend(metric.prometheus())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+DOWNLOAD_SECONDS = REGISTRY.histogram(
+    "crawler_download_seconds", "Time to download a page from the cache server.")
+PARSE_SECONDS = REGISTRY.histogram(
+    "crawler_parse_seconds", "Time to parse the links and text of a page.")
+TOKENIZE_SECONDS = REGISTRY.histogram(
+    "crawler_tokenize_seconds", "Time to tokenize the text of a page.")
+FILTER_SECONDS = REGISTRY.histogram(
+    "crawler_filter_seconds", "Time to check one url against the scraper rules.")
+FRONTIER_LOCK_SECONDS = REGISTRY.histogram(
+    "crawler_frontier_lock_wait_seconds", "Time waited for the frontier lock.")
+STORAGE_SYNC_SECONDS = REGISTRY.histogram(
+    "crawler_storage_sync_seconds", "Time to write a batch to the save file.")
+DOWNLOADS = REGISTRY.counter(
+    "crawler_downloads_total", "Pages downloaded.")
+DOWNLOAD_ERRORS = REGISTRY.counter(
+    "crawler_download_errors_total", "Downloads without a 200 status.")
+PAGES = REGISTRY.counter(
+    "crawler_pages_total", "Pages whose links were added to the frontier.")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = self.server.registry.prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsReporter(object):
+    ''' Writes the metrics of a registry to `path` as json every `interval`
+    seconds, with the pages per second since the last snapshot, and serves
+    them in the Prometheus text format on localhost:`port` if port is set. '''
+    def __init__(self, path, interval=10.0, port=0, registry=REGISTRY):
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self.stopped = Event()
+        self.last_time = time.monotonic()
+        self.last_pages = 0
+        self.thread = None
+        self.server = None
+        if port:
+            self.server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+            self.server.registry = registry
+            Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def start(self):
+        if self.interval > 0:
+            self.thread = Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        if self.server is not None:
+            self.server.shutdown()
+        if self.interval > 0:
+            self.write()
+
+    def write(self):
+        snapshot = self.registry.snapshot()
+        now = time.monotonic()
+        pages = snapshot.get(PAGES.name, 0)
+        snapshot["pages_per_second"] = round(
+            (pages - self.last_pages) / max(now - self.last_time, 1e-9), 3)
+        self.last_time, self.last_pages = now, pages
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.write()
@@ -0,0 +1,129 @@
+import atexit
+import logging
+from collections import deque
+from queue import SimpleQueue
+from threading import Thread, Event, Lock
+from logging.handlers import QueueHandler, QueueListener
+
+
+class _LogRouter(logging.Handler):
+    ''' Writes every record to the log file of its logger and to the terminal. '''
+    def __init__(self, formatter):
+        super().__init__()
+        self.formatter = formatter
+        self.files = dict()
+        self.console = logging.StreamHandler()
+        self.console.setLevel(logging.INFO)
+        self.console.setFormatter(formatter)
+
+    def add_file(self, name, path):
+        if name not in self.files:
+            handler = logging.FileHandler(path)
+            handler.setLevel(logging.DEBUG)
+            handler.setFormatter(self.formatter)
+            self.files[name] = handler
+
+    def emit(self, record):
+        handler = self.files.get(record.name)
+        if handler is not None:
+            handler.handle(record)
+        if record.levelno >= self.console.level:
+            self.console.handle(record)
+
+    def flush(self):
+        for handler in self.files.values():
+            handler.flush()
+        self.console.flush()
+
+
+_log_queue = SimpleQueue()
+_log_router = None
+_log_listener = None
+_log_lock = Lock()
+
+
+def queue_logging(logger, path):
+    ''' Log the records of logger to path and the terminal from a background
+    thread, so the threads that log never wait on a file or the terminal. '''
+    global _log_router, _log_listener
+    with _log_lock:
+        if _log_listener is None:
+            _log_router = _LogRouter(logging.Formatter(
+                "%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+            _log_listener = QueueListener(_log_queue, _log_router)
+            _log_listener.start()
+            atexit.register(_log_listener.stop)
+        _log_router.add_file(logger.name, path)
+    logger.addHandler(QueueHandler(_log_queue))
+
+
+class BufferedFile(object):
+    ''' Text file written by the thread of an OutputWriter. '''
+    def __init__(self, path, mode):
+        self.path = path
+        self.mode = mode
+        self.lines = deque()
+        self.file = open(path, mode)
+
+    def write(self, text):
+        # deque.append is atomic, the caller never blocks on a lock or the disk.
+        self.lines.append(text)
+
+    def drain(self):
+        if not self.lines:
+            return
+        lines = self.lines
+        self.file.write("".join(lines.popleft() for _ in range(len(lines))))
+        self.file.flush()
+
+    def close(self):
+        self.drain()
+        self.file.close()
+
+
+class OutputWriter(object):
+    ''' Writes buffered files and reports from one background thread.
+
+    Lines written to the files returned by `open` are appended to a buffer and
+    written to disk every `flush_interval` seconds, so a worker thread never
+    waits on file I/O. Reports passed to `write_file` replace the whole file
+    on the next flush. `close` writes everything that is still buffered.
+    '''
+    def __init__(self, flush_interval=1.0):
+        self.flush_interval = flush_interval
+        self.files = list()
+        self.reports = deque()
+        self.lock = Lock()
+        self.stopped = Event()
+        self.thread = Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def open(self, path, mode="a"):
+        buffered = BufferedFile(path, mode)
+        with self.lock:
+            self.files.append(buffered)
+        return buffered
+
+    def write_file(self, path, text):
+        self.reports.append((path, text))
+
+    def flush(self):
+        with self.lock:
+            for buffered in self.files:
+                buffered.drain()
+            while self.reports:
+                path, text = self.reports.popleft()
+                with open(path, "w") as f:
+                    f.write(text)
+
+    def close(self):
+        self.stopped.set()
+        self.thread.join()
+        self.flush()
+        with self.lock:
+            for buffered in self.files:
+                buffered.close()
+
+    def _run(self):
+        while not self.stopped.wait(self.flush_interval):
+            self.flush()
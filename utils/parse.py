@@ -0,0 +1,94 @@
+from html.parser import HTMLParser
+from urllib.parse import urlparse, urljoin
+
+from utils.metrics import PARSE_SECONDS
+
+
+def resolve_link(url, href):
+    # Absolute url of href without its fragment, or None if it is not a link.
+    if href == "" or href is None:
+        return None
+
+    href = urljoin(url, href)
+    parsed_href = urlparse(href)
+
+    if not (bool(parsed_href.netloc) and bool(parsed_href.scheme)):
+        return None
+
+    return str(parsed_href._replace(fragment="").geturl().strip())
+
+
+def parse_bs4(content):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(content, 'html.parser')
+    hrefs = [link.get('href') for link in soup.find_all("a")]
+    for script in soup(["script", "style"]):
+        script.extract()
+    return hrefs, soup.get_text()
+
+
+def parse_lxml(content):
+    from lxml import etree
+
+    root = etree.fromstring(content, etree.HTMLParser())
+    if root is None:
+        return [], ""
+    hrefs = root.xpath("//a/@href")
+    etree.strip_elements(root, etree.Comment, "script", "style", with_tail=False)
+    return hrefs, "".join(root.itertext())
+
+
+class _StreamParser(HTMLParser):
+    ''' Collects hrefs and visible text without building a tree. '''
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.hrefs = []
+        self.chunks = []
+        self.skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            self.hrefs.append(dict(attrs).get("href"))
+        elif tag in ("script", "style"):
+            self.skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style") and self.skip_depth:
+            self.skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self.chunks.append(data)
+
+
+def parse_stream(content):
+    parser = _StreamParser()
+    if isinstance(content, bytes):
+        content = content.decode("utf-8", errors="replace")
+    parser.feed(content)
+    parser.close()
+    return parser.hrefs, "".join(parser.chunks)
+
+
+PARSERS = {
+    "bs4": parse_bs4,
+    "lxml": parse_lxml,
+    "stream": parse_stream,
+}
+
+
+def parse_html(url, content, backend="bs4"):
+    ''' Parse a page once and return (links, visible text).
+
+    backend is one of PARSERS: "bs4" matches the BeautifulSoup behavior of
+    extract_next_links and html2text, "lxml" and "stream" are faster.
+    '''
+    with PARSE_SECONDS.time():
+        hrefs, text = PARSERS[backend](content)
+        links = []
+        for href in hrefs:
+            link = resolve_link(url, href)
+            if link is not None:
+                links.append(link)
+    return links, text
@@ -0,0 +1,37 @@
+import os
+
+import cbor
+
+from utils import get_urlhash
+
+
+def record_path(directory, url):
+    return os.path.join(directory, f"{get_urlhash(url)}.cbor")
+
+
+def record(config, url, raw):
+    ''' Keep the cache server response of url in RECORDDIR, so the stand-in
+    cache server of the benchmarks can replay it. '''
+    os.makedirs(config.record_dir, exist_ok=True)
+    with open(record_path(config.record_dir, url), "wb") as f:
+        f.write(cbor.dumps({
+            "url": url,
+            "status": raw.status_code,
+            "content_type": raw.headers.get("content-type"),
+            "body": raw.content}))
+
+
+def load_record(directory, url):
+    ''' The recorded response of url as a dict, or None. '''
+    try:
+        with open(record_path(directory, url), "rb") as f:
+            return cbor.loads(f.read())
+    except FileNotFoundError:
+        return None
+
+
+def iter_records(directory):
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".cbor"):
+            with open(os.path.join(directory, name), "rb") as f:
+                yield cbor.loads(f.read())
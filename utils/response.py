@@ -1,15 +1,99 @@
 import pickle
 
+# Leading bytes of common files that are not html, checked by the scraper.
+MAGIC_BYTES = [
+    (b"%PDF", "pdf file"),
+    (b"\xFF\xD8\xFF", "jpg file"),
+    (b"\x89PNG", "png file"),
+    (b"GIF8", "gif file"),
+    (b"PK\x03\x04", "zip file"),
+    (b"\x1F\x8B", "gzip file"),
+    (b"\xD0\xCF\x11\xE0", "office file"),
+]
+
+
+class RawResponse(object):
+    ''' The parts of a requests.Response that Response and the scraper use. '''
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    def __bool__(self):
+        return self.status_code < 400
+
+    def __repr__(self):
+        return f"<Response [{self.status_code}]>"
+
+
 class Response(object):
+    ''' Response of the cache server for a url.
+
+    The page itself (raw_response, a pickled requests.Response) is only
+    unpickled when it is first used. `reject_reason` only looks at the status,
+    the content type and the size, so the pages it rejects are never decoded,
+    and in pipeline mode the others are first decoded in the parser process.
+    '''
     def __init__(self, resp_dict, raw):
         self.raw = raw
         self.url = resp_dict["url"]
         self.status = resp_dict["status"]
         self.error = resp_dict["error"] if "error" in resp_dict else None
-        try:
-            self.raw_response = (
-                pickle.loads(resp_dict["response"])
-                if "response" in resp_dict else
-                None)
-        except TypeError:
-            self.raw_response = None
+        self._payload = resp_dict.get("response")
+        self._raw_response = None
+        self._decoded = False
+
+    def __getstate__(self):
+        # Send the page to a parser process once, as the pickled payload. Of
+        # the http response of the cache server only the status and headers
+        # are kept: its content is the whole cbor body again.
+        state = dict(self.__dict__)
+        state["_raw_response"] = None
+        state["_decoded"] = False
+        if self.raw is not None:
+            state["raw"] = RawResponse(self.raw.status_code, self.raw.headers, b"")
+        return state
+
+    @property
+    def raw_response(self):
+        if not self._decoded:
+            try:
+                self._raw_response = (
+                    pickle.loads(self._payload)
+                    if self._payload is not None else
+                    None)
+            except TypeError:
+                self._raw_response = None
+            self._decoded = True
+        return self._raw_response
+
+    @property
+    def size(self):
+        # Size of the pickled page, known without decoding it.
+        return len(self._payload) if self._payload is not None else 0
+
+    @property
+    def content_type(self):
+        headers = getattr(self.raw, "headers", None) or {}
+        return headers.get("content-type")
+
+    @property
+    def body(self):
+        # The page content without copying it.
+        raw_response = self.raw_response
+        if raw_response is None or raw_response.content is None:
+            return memoryview(b"")
+        return memoryview(raw_response.content)
+
+    def reject_reason(self, max_size=0):
+        ''' Why a downloaded page should not be parsed, or None, without
+        decoding it. Only responses with status 200 are checked; the scraper
+        reports the rest and checks the content itself. '''
+        if self.status != 200:
+            return None
+        content_type = self.content_type
+        if content_type is not None and "text/html" not in content_type:
+            return f"not text/html but {content_type}"
+        if max_size and self.size > max_size:
+            return f"larger than {max_size} bytes"
+        return None
@@ -0,0 +1,39 @@
+import re
+from functools import lru_cache
+from threading import Lock
+
+from utils import get_stop_words
+from utils.metrics import TOKENIZE_SECONDS
+
+TOKEN_RE = re.compile(r"\S+")
+
+_dictionary = None
+_dictionary_lock = Lock()
+
+
+def _english_dictionary():
+    # Loaded once per process, on first use.
+    global _dictionary
+    with _dictionary_lock:
+        if _dictionary is None:
+            import enchant
+            _dictionary = enchant.Dict("en_US")
+    return _dictionary
+
+
+@lru_cache(maxsize=1 << 17)
+def is_english(word):
+    # Word frequencies on the web are very skewed, so most lookups are hits.
+    dictionary = _english_dictionary()
+    with _dictionary_lock:
+        return dictionary.check(word)
+
+
+def tokenize(text):
+    ''' Lowercased English words of text that are not stop words. '''
+    stop_words = get_stop_words()
+    with TOKENIZE_SECONDS.time():
+        text = text.replace("\x00", "").lower()
+        return [
+            word for word in TOKEN_RE.findall(text)
+            if word not in stop_words and is_english(word)]
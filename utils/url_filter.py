@@ -0,0 +1,84 @@
+import re
+import time
+from functools import lru_cache
+from urllib.parse import urlparse
+
+from utils.metrics import FILTER_SECONDS
+
+
+def _extension_re(extensions):
+    # Longest first, so "tar.gz" is tried before "gz".
+    return re.compile(r"\.(?:" + "|".join(sorted(
+        (re.escape(e) for e in set(extensions)), key=len, reverse=True)) + r")$")
+
+
+class UrlFilter(object):
+    ''' Url rules compiled once and evaluated against a single parse.
+
+    allowed_domains: hosts that are crawled together with their subdomains.
+    allowed_paths: {host: path prefix} for hosts that are only partly crawled.
+    denied_extensions: file extensions of the path that are never crawled,
+        in any case.
+    name_extensions: extensions that are not crawled when os.path.splitext
+        finds them on the last path segment, in any case. As for splitext,
+        a name such as ".svg" has no extension.
+    url_extensions: extensions that are not crawled when the whole url,
+        query included, ends with them; these are case sensitive.
+    traps: [(reason, regex)] matched case sensitively against the whole url.
+
+    check(url) returns (True, None) or (False, reason); recent verdicts are
+    kept in an LRU cache since the same links show up on many pages.
+    '''
+    def __init__(self, allowed_domains, allowed_paths, denied_extensions, traps,
+                 url_extensions=(), name_extensions=(), cache_size=1 << 16):
+        self.domain_re = re.compile(
+            r"(?:^|\.)(?:" + "|".join(re.escape(d) for d in allowed_domains) + r")$")
+        self.allowed_paths = dict(allowed_paths)
+        self.extension_re = _extension_re(denied_extensions)
+        self.url_extension_re = _extension_re(url_extensions) if url_extensions else None
+        self.name_extensions = frozenset(e.lower() for e in name_extensions)
+        self.trap_reasons = dict()
+        patterns = []
+        for i, (reason, pattern) in enumerate(traps):
+            self.trap_reasons[f"trap{i}"] = reason
+            patterns.append(f"(?P<trap{i}>{pattern})")
+        self.trap_re = re.compile("|".join(patterns)) if patterns else None
+        self._cached_check = lru_cache(maxsize=cache_size)(self._check)
+
+    def check(self, url):
+        start = time.perf_counter()
+        verdict = self._cached_check(url)
+        FILTER_SECONDS.observe(time.perf_counter() - start)
+        return verdict
+
+    def _check(self, url):
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https"):
+            return False, f"scheme {parsed.scheme or 'missing'}"
+
+        full_url = parsed.geturl()
+        path = parsed.path.lower()
+        if self.extension_re.search(path):
+            return False, "file extension"
+        if self.name_extensions:
+            # Leading dots do not start an extension, as in splitext.
+            name = path.rpartition("/")[2].lstrip(".")
+            if "." in name and name.rpartition(".")[2] in self.name_extensions:
+                return False, "file extension"
+        if self.url_extension_re is not None and self.url_extension_re.search(full_url):
+            return False, "file extension"
+
+        netloc = parsed.netloc.lower()
+        if not netloc:
+            return False, "no domain"
+        if not self.domain_re.search(netloc):
+            prefix = self.allowed_paths.get(netloc)
+            if prefix is None or not parsed.path.startswith(prefix):
+                return False, f"domain {netloc} not allowed"
+
+        if self.trap_re is not None:
+            match = self.trap_re.search(full_url)
+            if match:
+                return False, self.trap_reasons[match.lastgroup]
+
+        return True, None